@@ -0,0 +1,49 @@
+import statistics
+import subprocess
+import sys
+
+# 各导入语句的耗时预算（秒，取多次冷启动的中位数）及不允许被连带导入的重型依赖
+BUDGETS = {
+    'import models': (0.05, ['jira', 'pandas', 'numpy', 'openpyxl', 'dateutil', 'wcwidth', 'matplotlib']),
+    'from models import IssueList, BaseFilter, ConcatFilter': (0.15, ['pandas', 'numpy', 'openpyxl', 'matplotlib']),
+    # openpyxl 在安装了 numpy 时会自行导入 numpy，此处不检查
+    'from models import WorksheetShell, CellSetting': (0.6, ['pandas', 'matplotlib']),
+}
+REPEAT = 5
+
+PROBE = r'''
+import sys, time
+t = time.perf_counter()
+{statement}
+cost = time.perf_counter() - t
+print(cost)
+print(','.join(sorted(set(name.split('.')[0] for name in sys.modules))))
+'''
+
+
+def measure(statement: str):
+    costs = []
+    loaded = set()
+    for _ in range(REPEAT):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(statement=statement)],
+                                capture_output=True, text=True, check=True).stdout.splitlines()
+        costs.append(float(output[0]))
+        loaded = set(output[1].split(','))
+    return statistics.median(costs), loaded
+
+
+if __name__ == '__main__':
+    failed = False
+    for stmt, (budget, forbidden) in BUDGETS.items():
+        try:
+            median_cost, loaded_modules = measure(stmt)
+        except subprocess.CalledProcessError as e:
+            print("[ERROR] %s\n%s" % (stmt, e.stderr))
+            failed = True
+            continue
+        leaked = [name for name in forbidden if name in loaded_modules]
+        ok = median_cost <= budget and not leaked
+        failed |= not ok
+        print("[%s] %-60s %.3fs (budget %.3fs)%s" % ('PASS' if ok else 'FAIL', stmt, median_cost, budget,
+                                                      ', leaked: %s' % leaked if leaked else ''))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+from models import IssueList
+from models.issueData import PROCESS_MIN_CPUS, PROCESS_MIN_ISSUES
+
+# 合成数据规模
+NUM_ISSUES = 20000
+PAGE_SIZE = 100
+WORKERS = [1, 2, 4, 8]
+
+FIELDS = [
+    {'id': 'customfield_10001', 'name': '基础机芯&OS'},
+    {'id': 'customfield_10002', 'name': '项目（其他）'},
+    {'id': 'customfield_10003', 'name': '任务类型'},
+    {'id': 'customfield_10004', 'name': 'Epic Link'},
+    {'id': 'customfield_10005', 'name': 'Epic Name'},
+    {'id': 'customfield_10006', 'name': '认证项'},
+]
+
+
+def fake_user(i: int):
+    return {
+        'displayName': 'User %d' % i,
+        'key': 'user%d' % i,
+        'name': 'user%d' % i,
+        'emailAddress': 'user%d@example.com' % i,
+    }
+
+
+def fake_raw_issue(i: int):
+    user = fake_user(i % 20)
+    timestring = '2025-%02d-%02dT10:00:00.000+0800' % (i % 12 + 1, i % 28 + 1)
+    return {
+        'id': str(100000 + i),
+        'key': 'DTCER-%d' % i,
+        'fields': {
+            'issuetype': {'name': '认证测试任务', 'id': '10100', 'subtask': False},
+            'priority': {'name': 'Medium', 'id': '3'},
+            'status': {'name': 'In Progress', 'id': '3', 'statusCategory': {'id': 4}},
+            'summary': '  Test&amp;task   %d<br/>summary  ' % i,
+            'project': {'key': 'DTCER', 'name': 'DT Certification', 'id': '10000'},
+            'description': 'Line 1<br/>\r\n\r\nLine\t2 ' * 5,
+            'reporter': user,
+            'creator': user,
+            'assignee': user,
+            'created': timestring,
+            'updated': timestring,
+            'resolution': None,
+            'resolutiondate': None,
+            'labels': ['label-a', 'label-b'],
+            'components': [{'id': str(j), 'name': 'Component %d' % j} for j in range(i % 3 + 1)],
+            'comment': {'comments': [{
+                'body': 'Comment %d<br/>of issue %d' % (j, i),
+                'author': user,
+                'created': timestring,
+                'updateAuthor': user,
+                'updated': timestring,
+            } for j in range(3)]},
+            'worklog': {'worklogs': [{
+                'id': str(i * 10 + j),
+                'author': user,
+                'created': timestring,
+                'issueId': str(100000 + i),
+                'comment': 'Work %d' % j,
+                'started': timestring,
+                'timeSpent': '1h',
+                'timeSpentSeconds': 3600,
+                'updateAuthor': user,
+                'updated': timestring,
+            } for j in range(5)]},
+            'subtasks': [],
+            'customfield_10001': {'id': '1', 'value': 'Platform'},
+            'customfield_10002': None,
+            'customfield_10003': {'id': '2', 'value': 'Test', 'child': {'id': '3', 'value': 'Function'}},
+            'customfield_10004': 'DTCER-EPIC-%d' % (i % 50),
+        },
+    }
+
+
+def fake_pages():
+    for start in range(0, NUM_ISSUES, PAGE_SIZE):
+        yield [fake_raw_issue(i) for i in range(start, min(start + PAGE_SIZE, NUM_ISSUES))]
+
+
+# 强制使用指定的进程数（关闭自动退回串行），用于测量进程池解析本身的收益
+def run(processes: int = None):
+    issue_list = IssueList(FIELDS)
+    begin = time.perf_counter()
+    issue_list.import_issue_pages(fake_pages(), prefetch=False, processes=processes, auto_fallback=False)
+    cost = time.perf_counter() - begin
+    assert len(issue_list) == NUM_ISSUES
+    return cost
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        NUM_ISSUES = int(sys.argv[1])
+    results = [('serial', run())]
+    for workers in WORKERS:
+        results.append(('%d worker(s)' % workers, run(workers)))
+    print("Parsing %d issues (page size %d):" % (NUM_ISSUES, PAGE_SIZE))
+    for label, cost in results:
+        print("\t%-12s %8.3fs  %6.0f issues/s  x%.2f" % (label, cost, NUM_ISSUES / cost, results[0][1] / cost))
+    # 自动模式的阈值：父进程重建事务对象约占串行解析耗时的 10%~25%，进程池启动约 0.2s，
+    # 2 核时约 700 个事务达到收支平衡；单核时子进程与父进程争用 CPU，任何进程数都慢于串行
+    _, auto_processes = IssueList.worth_processes(fake_pages(), max(WORKERS))
+    print("Auto mode (cpu>=%d, issues>=%d): %s on %d cpu(s)" % (
+        PROCESS_MIN_CPUS, PROCESS_MIN_ISSUES, '%d worker(s)' % auto_processes if auto_processes else 'serial',
+        os.cpu_count() or 1))
@@ -1,46 +1,52 @@
-from models import JIRALogin, IssueList, ConcatFilter, WorksheetShell
-from models import CellSetting as CSt
+from models import JIRALogin, IssueList, ConcatFilter, StreamingSheetWriter, StyleCache
+from models.issueData import STATUS_CATEGORY_COLORS
 from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-import re
+from openpyxl.styles import Alignment, Font
 import time
 
 if __name__ == '__main__':
     jira_agent = JIRALogin.used_token(r'access_token.txt')
     issue_list = IssueList(jira_agent.get_fields())
-    issue_list.import_issues(jira_agent.search_by_jql_filter(ConcatFilter.EPIC_COMMENT))
-    comments_table = issue_list.get_comments_status(-1)
-    workbook = Workbook()
-    worksheet = workbook.active
-    for row_content in dataframe_to_rows(comments_table, index=False, header=False):
-        worksheet.append(row_content)
-    wss = WorksheetShell(worksheet)
-    # 纵向合并单元格
-    wss.batch_merge_cells_vertical(col_list=['A', 'B', 'C'])
-    # 复制合并
-    wss.copy_merge_cells_vertical('C', 'D')
-    # 水平居中，垂直居中
-    wss.batch_set(CSt.setting_text_alignment, col_list=['A', 'B', 'D'], horizontal='center')
-    # 水平居左，垂直居中
-    wss.batch_set(CSt.setting_text_alignment, col_list=['C', 'E'])
+    # 搜索时不下载评论，再按 Epic 并发获取最新的一条评论
+    issue_list.import_issue_pages(jira_agent.search_pages_by_jql_filter(ConcatFilter.EPIC_COMMENT,
+                                                                        fields='*all,-comment'))
+    jira_agent.attach_latest_comments(issue_list, num=1)
+    # 扁平记录直接写入流式工作簿，不经过 DataFrame
+    comments_records = issue_list.get_comments_records(-1)
+    # 流式写出：每行按最终样式一次写入
+    workbook = Workbook(write_only=True)
+    writer = StreamingSheetWriter(workbook.create_sheet())
     # 列宽
-    wss.batch_set_column_width({
+    writer.batch_set_column_width({
         'A': 20,
         'B': 30,
         'C': 40,
         'D': 15,
         'E': 100,
     })
-    # 自动换行
-    wss.batch_set(CSt.setting_word_wrap, col_list=['B', 'C', 'E'])
+    # 纵向合并单元格
+    writer.plan_merge_cells_vertical(col_list=['A', 'B', 'C'])
+    # 复制合并
+    writer.copy_merge_cells_vertical('C', 'D')
     # 单元格边框
-    wss.batch_set(CSt.setting_cell_border)
-    # 单元格颜色
-    wss.batch_set(CSt.setting_fill_color_by_re, col_list=['D'], re_pattern=re.compile(r'(<0x)([a-zA-Z0-9]{6})(>)'))
+    writer.set_column_style(border=StyleCache.border('thin'))
+    # 水平居中，垂直居中
+    writer.set_column_style(['A', 'D'], alignment=StyleCache.get(Alignment, horizontal='center', vertical='center'))
+    # 水平居中，垂直居中，自动换行
+    writer.set_column_style(['B'], alignment=StyleCache.get(Alignment, horizontal='center', vertical='center',
+                                                            wrap_text=True))
+    # 水平居左，垂直居中，自动换行
+    writer.set_column_style(['C', 'E'], alignment=StyleCache.get(Alignment, horizontal='left', vertical='center',
+                                                                 wrap_text=True))
     # 单元格字体
-    wss.batch_set(CSt.setting_basic_font, col_list=['D'], bold=True, color='FFFFFF')
+    writer.set_column_style(['D'], font=StyleCache.get(Font, name='Calibri', size=11, family=2, scheme='minor',
+                                                       bold=True, color='FFFFFF'))
+    # 状态列颜色：每种状态类别的填充样式预先构建，按记录中的颜色提示直接套用
+    status_styles = {color: {'D': {'fill': StyleCache.fill(color)}} for color in STATUS_CATEGORY_COLORS.values()}
+    for *row_content, status_color in comments_records:
+        writer.append(row_content, status_styles.get(status_color))
+    writer.close()
     # 输出表格
-    workbook.worksheets[0] = wss.worksheet
     filename = 'Comments snapshot at ' + time.asctime().replace(':', '-') + '.xlsx'
     # filename = 'Comments snapshot.xlsx'
     workbook.save(filename)
@@ -0,0 +1,173 @@
+import copy
+import os
+import sys
+import tempfile
+import jira.resources as jira_res
+from openpyxl import Workbook
+from issue_parsing_benchmark import FIELDS, fake_raw_issue
+from models import IssueList, JIRAOperator, Matrix
+from models.component import ReferenceMap
+
+# 合成数据规模及流式模式的分块大小
+NUM_TASKS = 40
+CHUNK_SIZE = 7
+# 并行模式（线程池获取事务链及生成坐标）的线程数
+PARALLEL_WORKERS = 4
+NUM_EPICS = 3
+REF_FILENAME = 'ref.xlsx'
+
+
+# 参考表：测试任务表按 (认证项, 模块) × (任务类型) 定位，管理任务表只有“认证管理”一列
+def build_reference_workbook(filename: str):
+    workbook = Workbook()
+    test_ws = workbook.active
+    test_ws.title = 'Test'
+    test_ws.append([None, None, None, 'Test', 'Test'])
+    test_ws.append([None, None, None, 'Function', 'Perf'])
+    test_ws.append(['G', 'CertA', 'Comp1', 1, 2])
+    test_ws.append(['G', 'CertA', 'Comp2', 3, 4])
+    manage_ws = workbook.create_sheet('Manage')
+    manage_ws.append([None, None, None, 'M'])
+    manage_ws.append([None, None, None, '认证管理'])
+    manage_ws.append(['G', 'CertA', 'Comp1', 5])
+    manage_ws.append(['G', 'CertA', 'Comp2', 6])
+    workbook.save(filename)
+
+
+# Epic 0 的认证项在参考表中不存在，用于产生坐标匹配失败
+def fake_epic(i: int):
+    raw = fake_raw_issue(10000 + i)
+    raw['key'] = 'DTCER-EPIC-%d' % i
+    fields = raw['fields']
+    fields['issuetype'] = {'name': 'Epic', 'id': '10000', 'subtask': False}
+    fields['customfield_10005'] = 'Epic %d' % i
+    fields['customfield_10006'] = {'id': '9', 'value': 'P', 'child': {'id': '10', 'value': 'CertA' if i else 'Bad'}}
+    fields['worklog'] = {'worklogs': []}
+    return raw
+
+
+# 测试任务及管理任务，部分没有工作日志（其中一半已解决）
+def fake_task(i: int):
+    raw = fake_raw_issue(i)
+    fields = raw['fields']
+    fields['customfield_10004'] = 'DTCER-EPIC-%d' % (i % NUM_EPICS)
+    fields['components'] = [{'id': '1', 'name': 'Comp%d' % (i % 2 + 1)}]
+    fields['customfield_10003'] = {'id': '2', 'value': 'Test',
+                                   'child': {'id': '3', 'value': 'Function' if i % 4 else 'Perf'}}
+    if i % 5 == 0:
+        fields['issuetype'] = {'name': '认证管理任务', 'id': '10101', 'subtask': False}
+    if i % 7 == 0:
+        fields['worklog'] = {'worklogs': []}
+        fields['resolutiondate'] = None if i % 14 else '2025-03-03T10:00:00.000+0800'
+    return raw
+
+
+def fake_subtask(i: int, parent: int):
+    raw = fake_raw_issue(20000 + i)
+    raw['key'] = 'DTCER-S%d' % i
+    fields = raw['fields']
+    fields['issuetype'] = {'name': '子任务', 'id': '10102', 'subtask': True}
+    fields['parent'] = {'id': str(100000 + parent), 'key': 'DTCER-%d' % parent, 'fields': {
+        'issuetype': {'name': '认证测试任务', 'id': '10100', 'subtask': False},
+        'priority': {'name': 'Medium', 'id': '3'},
+        'status': {'name': 'In Progress', 'id': '3', 'statusCategory': {'id': 4}},
+        'summary': 'Parent %d' % parent,
+    }}
+    fields['components'] = [{'id': '1', 'name': 'Comp1'}]
+    return raw
+
+
+# 子任务 S1 排在父任务之前，S2 在父任务已加载之后的分块中到达
+def fake_raw_issues():
+    raws = [fake_task(i) for i in range(NUM_TASKS)]
+    raws.insert(2, fake_subtask(1, 4))
+    raws.append(fake_subtask(2, 31))
+    return raws
+
+
+class FakeAgency:
+    def __init__(self, raws: list[dict]):
+        self.__raws = {raw['key']: raw for raw in raws}
+        self.__raws.update({raw['key']: raw for raw in map(fake_epic, range(NUM_EPICS))})
+        self.__ids = {raw['id']: raw for raw in self.__raws.values()}
+
+    def get_fields(self):
+        return FIELDS
+
+    def get_single_issue(self, key_or_id: str):
+        raw = self.__raws.get(key_or_id) or self.__ids[key_or_id]
+        return jira_res.Issue(options={}, session=None, raw=copy.deepcopy(raw))
+
+
+def pages(raws: list[dict], size: int):
+    for start in range(0, len(raws), size):
+        yield [copy.deepcopy(raw) for raw in raws[start:start + size]]
+
+
+def full_matrix(raws: list[dict], max_workers: int = None):
+    issue_list = IssueList(FIELDS)
+    issue_list.import_issue_pages(pages(raws, len(raws)), prefetch=False)
+    return Matrix(issue_list, JIRAOperator(FakeAgency(raws)), REF_FILENAME, max_workers=max_workers)
+
+
+# 增量更新场景：在原始事务（含 Epic）上修改 Task 的模块及 Epic 的概要、删除一个 Task、新增一个子任务
+def delta_raw_issues():
+    original = fake_raw_issues() + [fake_epic(i) for i in range(NUM_EPICS)]
+    updated = copy.deepcopy(original)
+    by_key = {raw['key']: raw for raw in updated}
+    by_key['DTCER-5']['fields']['components'] = [{'id': '2', 'name': 'Comp2'}]
+    by_key['DTCER-EPIC-1']['fields']['summary'] = 'Renamed epic'
+    updated.remove(by_key['DTCER-6'])
+    updated.append(fake_subtask(3, 9))
+    changed_keys = ['DTCER-5', 'DTCER-EPIC-1', 'DTCER-S3']
+    return original, updated, changed_keys, ['DTCER-6']
+
+
+def delta_matrix(original: list[dict], updated: list[dict], changed_keys: list[str], removed_keys: list[str]):
+    matrix = full_matrix(original)
+    changed = IssueList(FIELDS)
+    changed.import_issue_pages(pages([raw for raw in updated if raw['key'] in changed_keys], len(updated)),
+                               prefetch=False)
+    return matrix.apply_delta(changed, removed_keys)
+
+
+def streaming_matrix(raws: list[dict]):
+    chunks = IssueList(FIELDS).iter_issue_pages(pages(raws, CHUNK_SIZE), prefetch=False)
+    return Matrix.streaming(chunks, JIRAOperator(FakeAgency(raws)), REF_FILENAME, worklog_sink='worklog.csv')
+
+
+# 比较两个 Matrix 的全部输出：加载报告、工时明细、指标矩阵、时间立方及人员汇总
+def compare(expected: Matrix, actual: Matrix):
+    differences = []
+    if not expected.meta_data_loading_report().equals(actual.meta_data_loading_report()):
+        differences.append('loading report')
+    if not expected.export_worklog_table().astype(str).reset_index(drop=True).equals(
+            actual.export_worklog_table().astype(str).reset_index(drop=True)):
+        differences.append('worklog table')
+    for sheet_index in range(2):
+        ref_map = ReferenceMap.from_file(REF_FILENAME, sheet_index, (2, 3))
+        if not (expected.build_metric_stack(ref_map) == actual.build_metric_stack(ref_map)).all():
+            differences.append('metric stack of %s' % ref_map.worksheet_name)
+        expected_cube, actual_cube = expected.build_time_cube(ref_map), actual.build_time_cube(ref_map)
+        if expected_cube[0] != actual_cube[0] or not (expected_cube[1] == actual_cube[1]).all():
+            differences.append('time cube of %s' % ref_map.worksheet_name)
+    if not expected.person_summary().equals(actual.person_summary()):
+        differences.append('person summary')
+    return differences
+
+
+if __name__ == '__main__':
+    os.chdir(tempfile.mkdtemp())
+    build_reference_workbook(REF_FILENAME)
+    raw_issues = fake_raw_issues()
+    baseline = full_matrix(raw_issues)
+    results = [('streaming', compare(baseline, streaming_matrix(raw_issues))),
+               ('parallel', compare(baseline, full_matrix(raw_issues, PARALLEL_WORKERS)))]
+    original_issues, updated_issues, delta_changed, delta_removed = delta_raw_issues()
+    results.append(('delta', compare(full_matrix(updated_issues),
+                                     delta_matrix(original_issues, updated_issues, delta_changed, delta_removed))))
+    failed = False
+    for label, diffs in results:
+        failed |= bool(diffs)
+        print("[%s] %-12s %s" % ('FAIL' if diffs else 'PASS', label, ', '.join(diffs) if diffs else 'identical'))
+    sys.exit(1 if failed else 0)
@@ -1,5 +1,8 @@
+import re
 from enum import Enum
 from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from .support import utils
 
 
 @dataclass(slots=True)
@@ -16,6 +19,37 @@ def and_(jql_f1: JQLFilter, jql_f2: JQLFilter):
     return "(%s) AND (%s)" % (jql_f1.content, jql_f2.content)
 
 
+# 限定在报表时间窗口内有工作日志的事务，以及窗口内解决、没有工作日志的事务（按标准工时计入默认工作日志）：
+# start 包含当天；end 为 date 时包含当天，为 datetime 时不包含该时刻
+# JQL 按天过滤，结果为窗口的超集，精确过滤由 Matrix 完成
+def worklog_window(jql_filter: JQLFilter, start: date | datetime = None, end: date | datetime = None):
+    worklog_conditions = []
+    resolution_conditions = []
+    # 带时区的边界先换算到报表时区，与 Matrix 的窗口一致
+    if isinstance(start, datetime):
+        start = utils.to_report_time(start)
+    if isinstance(end, datetime):
+        end = utils.to_report_time(end)
+    if start is not None:
+        worklog_conditions.append('worklogDate >= "%s"' % start.strftime('%Y-%m-%d'))
+        resolution_conditions.append('resolutiondate >= "%s"' % start.strftime('%Y-%m-%d'))
+    if end is not None:
+        if isinstance(end, datetime):
+            last_day = (end - timedelta(microseconds=1)).date()
+        else:
+            last_day = end
+        worklog_conditions.append('worklogDate <= "%s"' % last_day.strftime('%Y-%m-%d'))
+        resolution_conditions.append('resolutiondate < "%s"' % (last_day + timedelta(days=1)).strftime('%Y-%m-%d'))
+    if not worklog_conditions:
+        return jql_filter
+    window = "((%s) OR (timespent is EMPTY AND %s))" % (' AND '.join(worklog_conditions),
+                                                        ' AND '.join(resolution_conditions))
+    # ORDER BY 子句需保留在最后
+    content, *order_by = re.split(r'\s+(?=ORDER BY\s)', jql_filter.content, maxsplit=1, flags=re.IGNORECASE)
+    content = "(%s) AND %s" % (content, window)
+    return JQLFilter("%s（%s ~ %s）" % (jql_filter.description, start, end), ' '.join([content, *order_by]))
+
+
 class BaseFilter(JQLFilter, Enum):
     UNFINISHED_EPIC = (
         r"非谷歌未完成 Epic 按项目-优先级-概要排序",
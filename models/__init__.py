@@ -1,5 +1,39 @@
-from .accessAgent import JIRALogin, JIRAOperator
-from .issueData import IssueList
-from .JQL import BaseFilter, ConcatFilter
-from .support.workbookProcess import CellSetting, WorksheetShell
-from .workloadAnalyse import Matrix
+# 按需导入：首次访问名称时才加载所在模块及其依赖（jira/pandas/numpy/openpyxl 等）
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .accessAgent import JIRALogin, JIRAOperator
+    from .issueData import IssueList
+    from .JQL import BaseFilter, ConcatFilter
+    from .support.metadataCache import MetadataCache
+    from .support.workbookProcess import CellSetting, WorksheetShell, StreamingSheetWriter, StyleCache
+    from .workloadAnalyse import Matrix
+
+_LAZY_ATTRS = {
+    'JIRALogin': '.accessAgent',
+    'JIRAOperator': '.accessAgent',
+    'IssueList': '.issueData',
+    'BaseFilter': '.JQL',
+    'ConcatFilter': '.JQL',
+    'MetadataCache': '.support.metadataCache',
+    'CellSetting': '.support.workbookProcess',
+    'WorksheetShell': '.support.workbookProcess',
+    'StreamingSheetWriter': '.support.workbookProcess',
+    'StyleCache': '.support.workbookProcess',
+    'Matrix': '.workloadAnalyse',
+}
+
+__all__ = list(_LAZY_ATTRS.keys())
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
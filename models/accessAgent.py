@@ -1,10 +1,15 @@
 from jira import JIRA, JIRAError
+from jira.client import ResultList
+import jira.resources as jira_res
 import os
-from typing import Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable
 from . import fieldStructure as fieldsS
 from . import issueData as issueD
 from .JQL import JQLFilter
 from .support import exceptions as exc
+from .support.metadataCache import MetadataCache
 
 
 class JIRALogin:
@@ -12,15 +17,15 @@ class JIRALogin:
     server = "https://idisplayvision.com/jira/"
 
     @classmethod
-    def used_basic(cls, username: str = None, password: str = None):
+    def used_basic(cls, username: str = None, password: str = None, metadata_cache: MetadataCache = None):
         if username is None:
             username = input("Username: ")
         if password is None:
             password = input("Password: ")
-        return JIRAAgency(JIRA(server=cls.server, basic_auth=(username, password)))
+        return JIRAAgency(JIRA(server=cls.server, basic_auth=(username, password)), metadata_cache)
 
     @classmethod
-    def used_token(cls, access_token_resource: str = None):
+    def used_token(cls, access_token_resource: str = None, metadata_cache: MetadataCache = None):
         if access_token_resource is None:
             access_token_resource = input(
                 "access_token string or access_token filepath(input N/n use username&password):")
@@ -28,25 +33,125 @@ class JIRALogin:
             access_token = open(access_token_resource, 'r').readline()
         else:
             access_token = access_token_resource
-        return JIRAAgency(JIRA(server=cls.server, token_auth=access_token))
+        return JIRAAgency(JIRA(server=cls.server, token_auth=access_token), metadata_cache)
 
 
 class JIRAAgency:
-    def __init__(self, jira_obj: JIRA):
+    # 最新评论缓存的有效期（秒），缓存记录事务的 updated 时间，事务有变化时重新获取
+    COMMENT_CACHE_TTL = 30 * 24 * 3600
+
+    def __init__(self, jira_obj: JIRA, metadata_cache: MetadataCache = None, comment_cache: MetadataCache = None):
         self.__jira = jira_obj
+        # 字段等元数据走磁盘缓存，同一进程内重复获取不再请求服务器
+        self.__metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        if comment_cache is None:
+            comment_cache = MetadataCache(os.path.join(self.__metadata_cache.cache_dir, 'comments'),
+                                          ttl=self.COMMENT_CACHE_TTL)
+        self.__comment_cache = comment_cache
+
+    @property
+    def metadata_cache(self):
+        return self.__metadata_cache
+
+    def __metadata_name(self, *args: str):
+        return '|'.join([self.__jira.server_url, *args])
 
     def search_by_jql_filter(self, jql_filter: JQLFilter):
-        return self.__jira.search_issues(jql_str=jql_filter.content, startAt=0, maxResults=False)
+        return self.complete_worklogs(
+            self.__jira.search_issues(jql_str=jql_filter.content, startAt=0, maxResults=False))
+
+    # 分页搜索，逐页产出结果（ResultList，带 total 属性）
+    # raw: 页内元素为原始 JSON（dict）而非 jira Issue 对象，适用于进程池解析
+    # fields: 返回的字段，例如 '*all,-comment' 不下载评论（配合 attach_latest_comments 使用），为空时返回全部字段
+    def search_pages_by_jql_filter(self, jql_filter: JQLFilter, page_size: int = 100, raw=False,
+                                   fields: str | list[str] = None):
+        start = 0
+        while True:
+            if raw:
+                result = self.__jira.search_issues(jql_str=jql_filter.content, startAt=start, maxResults=page_size,
+                                                   fields=fields, json_result=True)
+                page = ResultList(result['issues'], result['startAt'], result['maxResults'], result['total'])
+            else:
+                page = self.__jira.search_issues(jql_str=jql_filter.content, startAt=start, maxResults=page_size,
+                                                 fields=fields)
+            if not page:
+                break
+            yield self.complete_worklogs(page)
+            start += len(page)
+            if start >= page.total:
+                break
 
     def get_project_issue_fields(self, project: fieldsS.Project, issue_type: fieldsS.IssueType):
-        return self.__jira.project_issue_fields(project=str(project.id), issue_type=str(issue_type.id),
-                                                startAt=0, maxResults=False)
+        def fetch():
+            field_list = self.__jira.project_issue_fields(project=str(project.id), issue_type=str(issue_type.id),
+                                                          startAt=0, maxResults=False)
+            return [field.raw for field in field_list]
+
+        raw_list = self.__metadata_cache.get(
+            self.__metadata_name('project_issue_fields', str(project.id), str(issue_type.id)), fetch)
+        # 由缓存的原始 JSON 构造不绑定会话的 Field 对象，仅用于读取字段属性
+        return [jira_res.Field(options={}, session=None, raw=raw) for raw in raw_list]
 
     def get_fields(self):
-        return self.__jira.fields()
+        return self.__metadata_cache.get(self.__metadata_name('fields'), self.__jira.fields)
+
+    # 通过评论接口按创建时间倒序获取最新的 num 条评论，返回按创建时间正序排列的 Comment 列表
+    # updated: 事务的更新时间，为空时不使用缓存；每个事务只保留一份缓存，updated 变化时覆盖旧缓存
+    def get_latest_comments(self, key_or_id: str, num: int, updated: str = None):
+        def fetch():
+            comments = self.__jira.comments(key_or_id, start_at=0, max_results=num, order_by='-created')
+            return [comment.raw for comment in comments[:num]]
+
+        if updated is None:
+            raw_list = fetch()
+        else:
+            name = self.__metadata_name('latest_comments', key_or_id, str(num))
+            record = self.__comment_cache.get(name, lambda: {'updated': updated, 'comments': fetch()})
+            if record['updated'] != updated:
+                self.__comment_cache.invalidate(name)
+                record = self.__comment_cache.get(name, lambda: {'updated': updated, 'comments': fetch()})
+            raw_list = record['comments']
+        # 由原始 JSON 构造不绑定会话的 Comment 对象，仅用于解析字段
+        return [fieldsS.Comment.init_obj(jira_res.Comment(options={}, session=None, raw=raw))
+                for raw in reversed(raw_list)]
+
+    # 并发获取各事务最新的 num 条评论并替换事务的评论列表
+    def attach_latest_comments(self, issues: list[issueD.Issue], num: int = 1, max_workers: int = 8):
+        def attach(issue: issueD.Issue):
+            issue.comments = self.get_latest_comments(issue.key, num, issue.updated_timestring)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 按顺序取结果以抛出获取过程中的异常
+            for future in [executor.submit(attach, issue) for issue in issues]:
+                future.result()
+        return issues
 
     def get_single_issue(self, key_or_id: str):
-        return self.__jira.issue(key_or_id)
+        return self.__complete_worklog(self.__jira.issue(key_or_id))
+
+    # 搜索及获取事务时内嵌的工作日志最多 20 条（worklog.total 为实际条数），超出时通过工作日志接口获取完整列表
+    # issue_obj 可以是 jira Issue 对象或原始 JSON（dict），未请求 worklog 字段时原样返回
+    def __complete_worklog(self, issue_obj: jira_res.Issue | dict):
+        if isinstance(issue_obj, dict):
+            worklog_field = issue_obj.get('fields', {}).get('worklog')
+            if worklog_field and worklog_field.get('total', 0) > len(worklog_field.get('worklogs', [])):
+                worklogs = [worklog.raw for worklog in self.__jira.worklogs(issue_obj['key'])]
+                issue_obj['fields']['worklog'] = {'startAt': 0, 'maxResults': len(worklogs), 'total': len(worklogs),
+                                                  'worklogs': worklogs}
+        else:
+            worklog_field = getattr(issue_obj.fields, 'worklog', None)
+            if worklog_field is not None and getattr(worklog_field, 'total', 0) > len(worklog_field.worklogs):
+                worklog_field.worklogs = self.__jira.worklogs(issue_obj.key)
+                worklog_field.maxResults = worklog_field.total = len(worklog_field.worklogs)
+        return issue_obj
+
+    # 补全一页事务中被截断的工作日志，需要补全的事务并发请求，没有截断时不产生额外请求
+    def complete_worklogs(self, issues: list, max_workers: int = 8):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 按顺序取结果以抛出获取过程中的异常
+            for future in [executor.submit(self.__complete_worklog, issue_obj) for issue_obj in issues]:
+                future.result()
+        return issues
 
     def create_issue(self, issue_data: dict[str, Any]):
         return self.__jira.create_issue(issue_data)
@@ -73,10 +178,16 @@ class JIRAOperator:
         self.__agency = agency
         self.__fields = fieldsS.FieldList(self.__agency.get_fields())
         self.__cache = issueD.IssueList()
+        # key/id -> Issue 索引，与 __cache 同步维护
+        self.__index: dict[str, issueD.Issue] = {}
         self.__num_dict = {
             'call_agency': 0,
             'call_find': 0,
         }
+        # 保护 __cache/__index/__num_dict 的全局锁
+        self.__lock = threading.RLock()
+        # 按 key/id 区分的拉取锁，避免多个线程重复拉取同一事务；只保留拉取中的 key，拉取结束后移除
+        self.__fetch_locks: dict[str, threading.Lock] = {}
 
     @property
     def ref_fields(self):
@@ -84,22 +195,66 @@ class JIRAOperator:
 
     @property
     def call_num_log(self):
-        return str(self.__num_dict)
+        with self.__lock:
+            return str(self.__num_dict)
+
+    def __cache_issue(self, issue: issueD.Issue):
+        # 调用方需持有 __lock
+        cached = self.__index.get(issue.key)
+        if cached is not None:
+            return cached
+        self.__cache.append(issue)
+        self.__index[issue.key] = issue
+        self.__index[issue.id] = issue
+        return issue
 
     def add_cache(self, issue_list: list[issueD.Issue]):
-        for issue in issue_list:
-            self.__cache.append(issue)
+        with self.__lock:
+            for issue in issue_list:
+                self.__cache_issue(issue)
+
+    # 用新版本替换缓存中的同 key 事务（增量更新时使用）
+    def refresh_cache(self, issue_list: list[issueD.Issue]):
+        with self.__lock:
+            self.remove_cache([issue.key for issue in issue_list])
+            for issue in issue_list:
+                self.__cache_issue(issue)
+
+    def remove_cache(self, keys: Iterable[str]):
+        with self.__lock:
+            removed = [self.__index[key] for key in keys if key in self.__index]
+            if not removed:
+                return
+            removed_ids = set(map(id, removed))
+            self.__cache[:] = [issue for issue in self.__cache if id(issue) not in removed_ids]
+            for issue in removed:
+                self.__index.pop(issue.key, None)
+                self.__index.pop(issue.id, None)
 
     def find_issue_by(self, key_or_id: str):
-        self.__num_dict['call_find'] += 1
-        cache = self.__cache.self_search_by(key_or_id)
-        if cache is not None:
-            return cache
-        issue_obj = self.__agency.get_single_issue(key_or_id)
-        self.__num_dict['call_agency'] += 1
-        issue = issueD.Issue.auto_adapt(issue_obj, self.__fields)
-        self.__cache.append(issue)
-        return issue
+        with self.__lock:
+            self.__num_dict['call_find'] += 1
+            cache = self.__index.get(key_or_id)
+            if cache is not None:
+                return cache
+            fetch_lock = self.__fetch_locks.setdefault(key_or_id, threading.Lock())
+        with fetch_lock:
+            # 等待期间可能已由其他线程拉取完成
+            with self.__lock:
+                cache = self.__index.get(key_or_id)
+                if cache is not None:
+                    return cache
+            try:
+                issue_obj = self.__agency.get_single_issue(key_or_id)
+                issue = issueD.Issue.auto_adapt(issue_obj, self.__fields)
+                with self.__lock:
+                    self.__num_dict['call_agency'] += 1
+                    return self.__cache_issue(issue)
+            finally:
+                # 结果已写入缓存（或拉取失败），等待中的线程持有锁对象的引用，移除不影响其继续执行
+                with self.__lock:
+                    if self.__fetch_locks.get(key_or_id) is fetch_lock:
+                        del self.__fetch_locks[key_or_id]
 
     def find_parents(self, issue: issueD.TaskLike):
         if issubclass(type(issue), issueD.Subtask):
@@ -1,2 +1,26 @@
-from .referenceMap import ReferenceMap
-from .coordinate import CoordinateCache
+# 按需导入：ReferenceMap 依赖 pandas/numpy/openpyxl，仅在首次访问时加载
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .referenceMap import ReferenceMap
+    from .coordinate import CoordinateCache
+
+_LAZY_ATTRS = {
+    'ReferenceMap': '.referenceMap',
+    'CoordinateCache': '.coordinate',
+}
+
+__all__ = list(_LAZY_ATTRS.keys())
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
+from typing import Callable
 import itertools
+from models.support import exceptions as exc
 
 
 @dataclass(slots=True, frozen=True)
@@ -35,6 +37,39 @@ class CoordinateSet:
         col_combination = itertools.product(*list(map(lambda x: x.iterable_value, self.__col_cs)))
         return itertools.product(row_combination, col_combination)
 
+    # 逐层展开坐标组合，每层用 check(prefix, length) 检查前缀是否可能匹配参考表坐标轴
+    # 坐标集的所有组合都需要匹配成功，任一前缀无法匹配时整个坐标集失败，立即抛出 NoMatchingError
+    # 后续层可能取 None 时（右对齐位置未定）不检查该层前缀
+    # complete: 由本轴的完整坐标构造报错用的完整坐标（行+列），前缀之后的各层取第一个值补全
+    @staticmethod
+    def __expand(coord_series: tuple[CoordinateValue], check: Callable[[tuple, int], bool] | None,
+                 complete: Callable[[tuple], tuple]):
+        levels = list(map(lambda x: x.iterable_value, coord_series))
+        if check is None:
+            return list(itertools.product(*levels))
+        length = len(levels)
+        prefixes = [()]
+        for i, values in enumerate(levels):
+            checking = all(None not in later for later in levels[i + 1:])
+            extended = []
+            for prefix in prefixes:
+                for value in values:
+                    candidate = (*prefix, value)
+                    if checking and not (i == length - 1 and value is None) and not check(candidate, length):
+                        raise exc.NoMatchingError(complete((*candidate, *(later[0] for later in levels[i + 1:]))))
+                    extended.append(candidate)
+            prefixes = extended
+        return prefixes
+
+    # 带前缀剪枝的 generator，产出顺序与 generator 一致
+    def pruned_generator(self, row_check: Callable[[tuple, int], bool] = None,
+                         col_check: Callable[[tuple, int], bool] = None):
+        first_row = tuple(map(lambda x: x.iterable_value[0], self.__row_cs))
+        first_col = tuple(map(lambda x: x.iterable_value[0], self.__col_cs))
+        row_combination = self.__expand(self.__row_cs, row_check, lambda x: (*x, *first_col))
+        col_combination = self.__expand(self.__col_cs, col_check, lambda x: (*first_row, *x))
+        yield from itertools.product(row_combination, col_combination)
+
 
 class CoordinateCache:
     def __init__(self):
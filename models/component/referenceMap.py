@@ -1,27 +1,163 @@
 import pandas as pd
 import numpy as np
+import hashlib
+import os
+import pickle
 import warnings
-from openpyxl import Workbook
+from contextlib import closing
+from xml.etree.ElementTree import iterparse
+from typing import Any
+from openpyxl import Workbook, load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from models.support.workbookProcess import WorksheetProcessor, RCActivator, HeatmapRenderer
 from models.support import exceptions as exc
 
 
 class ReferenceMap:
+    CACHE_DIR = '.reference_cache'
+    # 解析结果的格式版本，解析逻辑变化时递增以废弃旧缓存
+    CACHE_VERSION = 1
+
     def __init__(self, worksheet: Worksheet, origin_point_rc: tuple[int, int]):
         # origin_point_rc: 为坐标重叠域右下交点的自然行列坐标，对应值域左上起点的零点行列坐标
         self.__origin_ws = worksheet
+        self.__filename = None
+        self.__sheet_index = None
+        self.__sheet_name = worksheet.title
+        self.__downmix_groups = {}
+        self.__prefix_matches = {}
+        self.__axis_labels = {}
         # 原点行坐标，原点列坐标
         self.__op_r, self.__op_c = origin_point_rc
-        ws = WorksheetProcessor.copy_into(worksheet, Workbook().active)
-        unmerged_sheet = WorksheetProcessor.unmerge_cells_and_fill(ws, fill=True)
-        # unmerged_sheet = WorksheetProcessor(deepcopy(worksheet)).unmerge_cells_and_fill(fill=True)
-        table = pd.DataFrame(unmerged_sheet.values)
+        merged_scopes = [(merge_area.min_row, merge_area.min_col, merge_area.max_row, merge_area.max_col)
+                         for merge_area in worksheet.merged_cells.ranges]
+        self.__setup_from_grid(self.__expand_merged([list(row) for row in worksheet.values], merged_scopes))
+
+    # 从参考表文件载入：以只读模式解析，结果按文件内容哈希缓存，文件未变化时直接读取缓存
+    @classmethod
+    def from_file(cls, filename: str, sheet_index: int, origin_point_rc: tuple[int, int], use_cache=True,
+                  cache_dir: str = None):
+        ref_map = cls.__new__(cls)
+        ref_map.__origin_ws = None
+        ref_map.__filename = filename
+        ref_map.__sheet_index = sheet_index
+        ref_map.__downmix_groups = {}
+        ref_map.__prefix_matches = {}
+        ref_map.__axis_labels = {}
+        ref_map.__op_r, ref_map.__op_c = origin_point_rc
+        with open(filename, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        cache_path = os.path.join(cache_dir if cache_dir is not None else cls.CACHE_DIR,
+                                  '%s-%d-%d-%d-v%d.pkl' % (digest, sheet_index, *origin_point_rc, cls.CACHE_VERSION))
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    parsed = pickle.load(f)
+                ref_map.__sheet_name = parsed['sheet_name']
+                ref_map.__value_map = parsed['value_map']
+                ref_map.__axis_x = parsed['axis_x']
+                ref_map.__axis_y = parsed['axis_y']
+                ref_map.__value_numeric = parsed['value_numeric']
+                return ref_map
+            # 其他库版本写出的缓存可能引用不存在的模块或属性，同样重新解析
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError, ModuleNotFoundError) as e:
+                print("Reading reference cache(%s) failed: %s." % (cache_path, e))
+        sheet_name, grid = cls.__read_only_grid(filename, sheet_index)
+        ref_map.__sheet_name = sheet_name
+        ref_map.__setup_from_grid(grid)
+        if use_cache:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path + '.tmp', 'wb') as f:
+                    pickle.dump({
+                        'sheet_name': ref_map.__sheet_name,
+                        'value_map': ref_map.__value_map,
+                        'axis_x': ref_map.__axis_x,
+                        'axis_y': ref_map.__axis_y,
+                        'value_numeric': ref_map.__value_numeric,
+                    }, f)
+                os.replace(cache_path + '.tmp', cache_path)
+            except OSError as e:
+                print("Writing reference cache(%s) failed: %s." % (cache_path, e))
+        return ref_map
+
+    @staticmethod
+    def __read_only_grid(filename: str, sheet_index: int):
+        workbook = load_workbook(filename, read_only=True)
+        try:
+            worksheet = workbook.worksheets[sheet_index]
+            grid = [list(row) for row in worksheet.iter_rows(values_only=True)]
+            # 只读模式不提供合并信息，从工作表 XML 的 mergeCell 中读取
+            # 依赖 openpyxl 的内部接口，版本变化导致读取失败时退回普通模式载入
+            try:
+                merged_scopes = ReferenceMap.__read_merged_scopes(worksheet)
+            except Exception as e:
+                warnings.warn("Reading merged cells in read-only mode failed(%r), fall back to normal mode." % e)
+                return ReferenceMap.__normal_grid(filename, sheet_index)
+            return worksheet.title, ReferenceMap.__expand_merged(grid, merged_scopes)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def __read_merged_scopes(worksheet):
+        merged_scopes = []
+        with closing(worksheet._get_source()) as source:
+            for _, element in iterparse(source):
+                if element.tag.endswith('}mergeCell'):
+                    (min_row, max_row), (min_col, max_col) = RCActivator.scope_str2int(element.get('ref'))
+                    merged_scopes.append((min_row, min_col, max_row, max_col))
+                element.clear()
+        return merged_scopes
+
+    @staticmethod
+    def __normal_grid(filename: str, sheet_index: int):
+        workbook = load_workbook(filename)
+        try:
+            worksheet = workbook.worksheets[sheet_index]
+            merged_scopes = [(merge_area.min_row, merge_area.min_col, merge_area.max_row, merge_area.max_col)
+                             for merge_area in worksheet.merged_cells.ranges]
+            return worksheet.title, ReferenceMap.__expand_merged([list(row) for row in worksheet.values],
+                                                                 merged_scopes)
+        finally:
+            workbook.close()
+
+    # 按合并区域以左上角的值填充整个区域（对应解除合并并填充）
+    @staticmethod
+    def __expand_merged(grid: list[list[Any]], merged_scopes: list[tuple[int, int, int, int]]):
+        width = max([len(row) for row in grid] + [max_col for _, _, _, max_col in merged_scopes] + [0])
+        height = max([len(grid)] + [max_row for _, _, max_row, _ in merged_scopes])
+        grid = [row + [None] * (width - len(row)) for row in grid]
+        grid += [[None] * width for _ in range(height - len(grid))]
+        for min_row, min_col, max_row, max_col in merged_scopes:
+            value = grid[min_row - 1][min_col - 1]
+            for i in range(min_row - 1, max_row):
+                for j in range(min_col - 1, max_col):
+                    grid[i][j] = value
+        return grid
+
+    def __setup_from_grid(self, grid: list[list[Any]]):
+        table = pd.DataFrame(grid)
         table.dropna(axis=0, how='all', inplace=True)
         table.dropna(axis=1, how='all', inplace=True)
         self.__value_map = self.__reset_rc(table.iloc[self.__op_r:, self.__op_c:])
         self.__axis_x = self.__reset_rc(table.iloc[:self.__op_r, self.__op_c:])
         self.__axis_y = self.__reset_rc(table.iloc[self.__op_r:, :self.__op_c])
+        # 值域的数值形式，非数值为 nan
+        self.__value_numeric = self.__value_map.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    def __getstate__(self):
+        # 原参考表工作表不参与序列化，从文件载入的实例需要时重新读取
+        state = self.__dict__.copy()
+        if self.__filename is not None:
+            state['_ReferenceMap__origin_ws'] = None
+        return state
+
+    # 原参考表（从文件载入时按需读取）
+    @property
+    def __origin(self):
+        if self.__origin_ws is None:
+            self.__origin_ws = load_workbook(self.__filename).worksheets[self.__sheet_index]
+        return self.__origin_ws
 
     @staticmethod
     def __reset_rc(df: pd.DataFrame, row=True, col=True, row_drop=True, col_drop=True):
@@ -41,13 +177,17 @@ class ReferenceMap:
     def __ln_y(self):
         return self.__op_c
 
+    # 值域位置 (iloc_i, iloc_j) 对应的纵轴坐标及横轴坐标（各层）
+    def coord_labels(self, iloc_i: int, iloc_j: int):
+        return tuple(self.__axis_y.iloc[iloc_i, :]), tuple(self.__axis_x.iloc[:, iloc_j])
+
     @property
     def value_shape(self):
         return self.__value_map.shape
 
     @property
     def worksheet_name(self):
-        return self.__origin_ws.title
+        return self.__sheet_name
 
     def __check_level_x(self, level_x: int):
         if not 1 <= level_x <= self.__ln_x:
@@ -93,6 +233,31 @@ class ReferenceMap:
         level_length = (self.__ln_x, self.__ln_y)[axis]
         return [None] * (level_length - len(ata_coord_list)) + ata_coord_list
 
+    # 坐标轴上各位置的各层坐标，axis: 0 为横轴，1 为纵轴
+    def __axis_label_tuples(self, axis: int) -> list[tuple]:
+        if axis not in self.__axis_labels:
+            if axis == 0:
+                labels = self.__axis_x.to_numpy(dtype=object).T
+            else:
+                labels = self.__axis_y.to_numpy(dtype=object)
+            self.__axis_labels[axis] = [tuple(x) for x in labels]
+        return self.__axis_labels[axis]
+
+    # 坐标前缀剪枝：长度为 length 的坐标列表（与 locate_coord_cell 一致按层数右对齐）的前缀 prefix 是否可能匹配坐标轴上的位置
+    # None 表示该层不限定；length 超过层数时不做判断，交由 locate_coord_cell 报错；结果按前缀缓存
+    def match_coord_prefix(self, prefix: tuple, length: int, axis: int):
+        levels = (self.__ln_x, self.__ln_y)[axis]
+        if length > levels:
+            return True
+        key = (axis, levels - length, prefix)
+        result = self.__prefix_matches.get(key)
+        if result is None:
+            aligned = (None,) * (levels - length) + tuple(prefix)
+            result = any(all(coord is None or coord == label for coord, label in zip(aligned, labels))
+                         for labels in self.__axis_label_tuples(axis))
+            self.__prefix_matches[key] = result
+        return result
+
     def locate_coord_cell(self, row_coordinates: list[str], col_coordinates: list[str]):
         row_index = self.__locate_multilayer_coord(row_coordinates, axis=1, auto_adapt=True)
         col_index = self.__locate_multilayer_coord(col_coordinates, axis=0, auto_adapt=True)
@@ -116,91 +281,111 @@ class ReferenceMap:
         return int(located.index[0]), int(located.columns[0])
 
     def ref_value(self, iloc_i: int, iloc_j: int):
-        value = pd.to_numeric(self.__value_map.iloc[iloc_i, iloc_j], errors='coerce')
+        value = self.__value_numeric[iloc_i, iloc_j]
         if pd.isna(value):
             return None
         else:
             return value
 
-    def value_array2synthesize_sheet(self, value_array: np.ndarray, heatmap=True):
+    # 值域中没有有效参考值（非数值）的位置
+    @property
+    def ref_na_mask(self):
+        return np.isnan(self.__value_numeric)
+
+    # color_scale: 热力图使用 Excel 原生三色刻度条件格式，而不是逐格填充颜色
+    # worksheet: 已含参考表内容的目标工作表（例如 Workbook.copy_worksheet 克隆的模板），为空时复制到新工作簿
+    def value_array2synthesize_sheet(self, value_array: np.ndarray, heatmap=True, color_scale=False,
+                                     worksheet: Worksheet = None):
         # 数组的行列数应该与参考表的数据矩阵的行列数一致
         if value_array.shape != self.value_shape:
             raise ValueError("The shape of value_array(%s) is wrong, it shall be the same as ref_map: %s)."
                              % value_array.shape, self.value_shape)
-        worksheet = WorksheetProcessor.copy_into(self.__origin_ws, Workbook().active)
-        # 渲染器
-        renderer = HeatmapRenderer(worksheet, value_array.max(), value_array.min(),
-                                   zero_color='FFFFFF') if heatmap else None
-        for i in range(value_array.shape[0]):
-            for j in range(value_array.shape[1]):
-                value = value_array[i][j]
-                ws_i = self.__ln_x + i + 1
-                ws_j = self.__ln_y + j + 1
-                # 热力图
-                if heatmap:
-                    if self.ref_value(i, j) is None:
-                        renderer.colorful_value(ws_i, ws_j, value, color='D0D0D0')
-                    else:
-                        renderer.colorful_value(ws_i, ws_j, value)
-                else:
-                    worksheet.cell(ws_i, ws_j).value = value
+        if worksheet is None:
+            worksheet = WorksheetProcessor.copy_into(self.__origin, Workbook().active)
+        # 热力图（无参考值的位置标灰）
+        if heatmap:
+            renderer = HeatmapRenderer(worksheet, value_array.max(), value_array.min(), zero_color='FFFFFF')
+            render = renderer.color_scale_array if color_scale else renderer.colorful_array
+            render(self.__ln_x + 1, self.__ln_y + 1, value_array, color_mask=self.ref_na_mask, mask_color='D0D0D0')
+        else:
+            for i in range(value_array.shape[0]):
+                for j in range(value_array.shape[1]):
+                    worksheet.cell(self.__ln_x + i + 1, self.__ln_y + j + 1).value = value_array[i][j]
         return worksheet
 
-    def value_array2downmix_sheet(self, value_array: np.ndarray, level_x: int = None, level_y: int = None,
-                                  heatmap=True):
-        # level_x, level_y: belong to N*
-        if level_x is None and level_y is None:
-            warnings.warn("If you want a sheet with the same shape as the ref_map, use value_array2sheet().",
-                          RuntimeWarning)
-            return self.value_array2synthesize_sheet(value_array, heatmap=heatmap)
+    # 按某一层坐标压缩时的分组：返回各分组在值域中的起始下标，及各分组从第 1 层到该层的坐标
+    # 该层或其上层的坐标任一发生变化即开始新的分组，分组结果按 (level, axis) 缓存
+    def downmix_groups(self, level: int, axis: int) -> tuple[np.ndarray, np.ndarray]:
+        # level: belong to N*
+        key = (level, axis)
+        if key not in self.__downmix_groups:
+            if axis == 0:
+                self.__check_level_x(level)
+                labels = self.__axis_x.iloc[:level, :].to_numpy(dtype=object)
+            elif axis == 1:
+                self.__check_level_y(level)
+                labels = self.__axis_y.iloc[:, :level].to_numpy(dtype=object).T
+            else:
+                raise ValueError("The axis should be 0 or 1, but get %d." % axis)
+            changed = np.ones(labels.shape[1], dtype=bool)
+            changed[1:] = (labels[:, 1:] != labels[:, :-1]).any(axis=0)
+            starts = np.flatnonzero(changed)
+            self.__downmix_groups[key] = starts, labels[:, starts]
+        return self.__downmix_groups[key]
+
+    # 按层压缩值域数组：level_x 压缩列（横轴），level_y 压缩行（纵轴），为空时该方向不压缩
+    def downmix_array(self, value_array: np.ndarray, level_x: int = None, level_y: int = None):
         # 数组的行列数应该与参考表的数据矩阵的行列数一致
         if value_array.shape != self.value_shape:
             raise ValueError("The shape of value_array(%s) is wrong, it shall be the same as ref_map: %s)."
-                             % value_array.shape, self.value_shape)
+                             % (value_array.shape, self.value_shape))
+        if level_x is not None:
+            value_array = np.add.reduceat(value_array, self.downmix_groups(level_x, axis=0)[0], axis=1)
+        if level_y is not None:
+            value_array = np.add.reduceat(value_array, self.downmix_groups(level_y, axis=1)[0], axis=0)
+        return value_array
 
-        def downmix(array: np.ndarray, axis_series: pd.Series, axis: int):
-            assert axis == 0 or axis == 1
-            assert axis_series.size == array.shape[-(axis + 1)]
-            concat_list = []
-            dm_axis = [axis_series[0]]
-            start = 0
-            flag = False
-            for end in range(1, axis_series.size + 1):
-                if end == axis_series.size:
-                    flag = True
-                else:
-                    coord = axis_series[end]
-                    if coord != dm_axis[-1]:
-                        dm_axis.append(coord)
-                        flag = True
-                if flag:
-                    assert end > start
-                    if axis == 0:
-                        concat_list.append(array[:][start:end].sum(axis=1))
-                    else:
-                        concat_list.append(array[start:end][:].sum(axis=0))
-                    start = end
-                    flag = False
-            assert len(concat_list) == len(dm_axis)
-            if axis == 0:
-                return np.vstack(concat_list).T, pd.DataFrame(dm_axis).T
+    # 由同一个值域数组生成多个层级组合的压缩结果，相同 level_x 的列压缩只计算一次
+    def downmix_arrays(self, value_array: np.ndarray, levels: list[tuple[int | None, int | None]]):
+        downmixed_x = {}
+        results = {}
+        for level_x, level_y in levels:
+            if level_x not in downmixed_x:
+                downmixed_x[level_x] = self.downmix_array(value_array, level_x=level_x)
+            if level_y is None:
+                results[(level_x, level_y)] = downmixed_x[level_x]
             else:
-                return np.vstack(concat_list), pd.DataFrame(dm_axis)
+                results[(level_x, level_y)] = np.add.reduceat(downmixed_x[level_x],
+                                                              self.downmix_groups(level_y, axis=1)[0], axis=0)
+        return results
 
+    # worksheet: 空白的目标工作表，为空时新建工作簿
+    # template_ws: 与目标工作表同一工作簿内的参考表副本，用于复制坐标域及表头域，为空时使用原参考表
+    def value_array2downmix_sheet(self, value_array: np.ndarray, level_x: int = None, level_y: int = None,
+                                  heatmap=True, color_scale=False, worksheet: Worksheet = None,
+                                  template_ws: Worksheet = None):
+        # level_x, level_y: belong to N*
+        if level_x is None and level_y is None:
+            warnings.warn("If you want a sheet with the same shape as the ref_map, use value_array2sheet().",
+                          RuntimeWarning)
+            if worksheet is not None:
+                WorksheetProcessor.copy_into(template_ws if template_ws is not None else self.__origin, worksheet)
+            return self.value_array2synthesize_sheet(value_array, heatmap=heatmap, color_scale=color_scale,
+                                                     worksheet=worksheet)
+        downmix_xy = self.downmix_array(value_array, level_x, level_y)
         if level_x is not None:
-            self.__check_level_x(level_x)
-            downmix_x, axis_x = downmix(value_array, self.__axis_x.iloc[level_x - 1, :], axis=0)
+            axis_x = pd.DataFrame(self.downmix_groups(level_x, axis=0)[1])
         else:
-            downmix_x = value_array
             axis_x = self.__axis_x
         if level_y is not None:
-            self.__check_level_y(level_y)
-            downmix_xy, axis_y = downmix(downmix_x, self.__axis_y.iloc[:, level_y - 1], axis=1)
+            axis_y = pd.DataFrame(self.downmix_groups(level_y, axis=1)[1].T)
         else:
-            downmix_xy = downmix_x
             axis_y = self.__axis_y
         op_r, op_c = axis_x.shape[0], axis_y.shape[1]
-        worksheet = Workbook().active
+        if worksheet is None:
+            worksheet = Workbook().active
+        if template_ws is None:
+            template_ws = self.__origin
         # 填充横坐标域
         if level_x is not None:
             for i in range(axis_x.shape[0]):
@@ -208,7 +393,7 @@ class ReferenceMap:
                     worksheet.cell(i + 1, op_c + j + 1).value = axis_x.iloc[i, j]
         else:
             # 复制原表的横坐标域
-            WorksheetProcessor.copy_part_into(self.__origin_ws, worksheet,
+            WorksheetProcessor.copy_part_into(template_ws, worksheet,
                                               RCActivator.scope_int2str(1,
                                                                         self.__op_c + 1,
                                                                         self.__op_r,
@@ -221,7 +406,7 @@ class ReferenceMap:
                     worksheet.cell(op_r + i + 1, j + 1).value = axis_y.iloc[i, j]
         else:
             # 复制原表的纵坐标域
-            WorksheetProcessor.copy_part_into(self.__origin_ws, worksheet,
+            WorksheetProcessor.copy_part_into(template_ws, worksheet,
                                               RCActivator.scope_int2str(self.__op_r + 1,
                                                                         1,
                                                                         self.__op_r + self.__axis_y.shape[0],
@@ -229,22 +414,20 @@ class ReferenceMap:
                                               RCActivator.point_int2str(op_r + 1, 1))
         # 补充表头域
         if level_x is None and level_y is not None:
-            # 复制压缩列对应的表头域
-            WorksheetProcessor.copy_part_into(self.__origin_ws, worksheet,
+            # 复制压缩列（及其上层列）对应的表头域
+            WorksheetProcessor.copy_part_into(template_ws, worksheet,
                                               RCActivator.scope_int2str(1,
-                                                                        level_y,
+                                                                        1,
                                                                         self.__op_r,
                                                                         level_y),
                                               RCActivator.point_int2str(1, 1))
         # 填充值域
-        renderer = HeatmapRenderer(worksheet, value_array.max(), value_array.min(),
-                                   zero_color='FFFFFF') if heatmap else None
-        for i in range(downmix_xy.shape[0]):
-            for j in range(downmix_xy.shape[1]):
-                ws_i, ws_j = op_r + i + 1, op_c + j + 1
-                value = downmix_xy[i][j]
-                if heatmap:
-                    renderer.colorful_value(ws_i, ws_j, value)
-                else:
-                    worksheet.cell(ws_i, ws_j).value = value
+        if heatmap:
+            renderer = HeatmapRenderer(worksheet, downmix_xy.max(), downmix_xy.min(), zero_color='FFFFFF')
+            render = renderer.color_scale_array if color_scale else renderer.colorful_array
+            render(op_r + 1, op_c + 1, downmix_xy)
+        else:
+            for i in range(downmix_xy.shape[0]):
+                for j in range(downmix_xy.shape[1]):
+                    worksheet.cell(op_r + i + 1, op_c + j + 1).value = downmix_xy[i][j]
         return worksheet
@@ -1,8 +1,11 @@
-import jira.resources as jira_res
-from typing import Any
+from __future__ import annotations
+from typing import Any, TYPE_CHECKING
 from dataclasses import dataclass
 from .support import utils
 
+if TYPE_CHECKING:
+    import jira.resources as jira_res
+
 
 @dataclass(slots=True, frozen=True)
 class Field:
@@ -216,10 +219,11 @@ class Resolution:
     name: str
     description: str
 
+    # 部分 JIRA 实例的事务数据中 resolution 不带 description
     @classmethod
     def init_obj(cls, resolution_obj: jira_res.Resolution):
         return cls(
             id=resolution_obj.id,
             name=resolution_obj.name,
-            description=resolution_obj.description
+            description=getattr(resolution_obj, 'description', ''),
         )
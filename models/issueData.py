@@ -1,13 +1,33 @@
+from __future__ import annotations
+import itertools
+import os
 from abc import abstractmethod, ABC
-import jira.resources as jira_res
-import pandas as pd
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Callable, Any, TypeVar
+from typing import Callable, Any, Iterable, TypeVar, TYPE_CHECKING
 from . import fieldStructure as fieldsS
 from .support import exceptions as exc, utils
 from .component import CoordinateCache
 
+# jira 仅用于类型标注，pandas 在生成评论表时按需导入
+if TYPE_CHECKING:
+    import jira.resources as jira_res
+
 _F = TypeVar('_F')
+# 进程池解析的启用条件：父进程仍需重建事务对象（约为串行解析耗时的 10%~25%）并承担进程池启动开销（约 0.2s），
+# 至少 2 个 CPU 且事务数不少于阈值时才有收益，否则退回串行解析（参见 issue_parsing_benchmark.py）
+PROCESS_MIN_CPUS = 2
+PROCESS_MIN_ISSUES = 1000
+# 评论快照的列，status_color 为状态列的填充色提示（RRGGBB 或 None），不作为内容输出
+COMMENTS_COLUMNS = ['project', 'summary', 'labels', 'status', 'comments', 'status_color']
+# 状态类别 -> 状态填充色
+STATUS_CATEGORY_COLORS = {
+    '2': 'A6A6A6',
+    '4': '00B0F0',
+    '3': '00B050',
+}
 
 
 # 事务核心字段
@@ -45,21 +65,26 @@ class Issue(IssueLike):
         self.created_timestring = issue_obj.get_field('created')
         self.updated_timestring = issue_obj.get_field('updated')
         # 完成情况
-        self.resolution = issue_obj.fields.resolution
+        resolution = issue_obj.fields.resolution
+        self.resolution = fieldsS.Resolution.init_obj(resolution) if resolution is not None else None
         self.resolution_timestring = issue_obj.get_field('resolutiondate')
         # 标签类字段
         self.labels = fields_obj.labels
         self.components: list[fieldsS.Component] = []
         for component in issue_obj.get_field('components'):
             self.components.append(fieldsS.Component.init_obj(component))
-        # 评论列表
+        # 评论列表（搜索时排除了 comment 字段则为空，可由 JIRAAgency.attach_latest_comments 补充）
         self.comments = []
-        for comment in fields_obj.comment.comments:
-            self.comments.append(fieldsS.Comment.init_obj(comment))
-        # 工作日志
-        self.worklogs = []
-        for worklog in fields_obj.worklog.worklogs:
-            self.worklogs.append(fieldsS.Worklog.init_obj(worklog))
+        comment_field = getattr(fields_obj, 'comment', None)
+        if comment_field is not None:
+            for comment in comment_field.comments:
+                self.comments.append(fieldsS.Comment.init_obj(comment))
+        # 工作日志，按开始时间排序，worklog_starts 为对应的开始时间，用于按时间窗口二分截取
+        worklogs = [fieldsS.Worklog.init_obj(worklog) for worklog in fields_obj.worklog.worklogs]
+        starts = [utils.parse_jira_time(worklog.started_timestring) for worklog in worklogs]
+        order = sorted(range(len(worklogs)), key=starts.__getitem__)
+        self.worklogs: list[fieldsS.Worklog] = [worklogs[i] for i in order]
+        self.worklog_starts: list[datetime] = [starts[i] for i in order]
         # 子任务
         self.subtasks = []
         for subtask in issue_obj.get_field('subtasks'):
@@ -116,23 +141,25 @@ class Issue(IssueLike):
     def components_string(self):
         return ', '.join(self.components_tuple)
 
+    @property
+    def status_color(self):
+        return STATUS_CATEGORY_COLORS.get(str(self.workflowStatus.statusCategory))
+
     @property
     def colored_status(self):
-        match str(self.workflowStatus.statusCategory):
-            case '2':
-                color = '<0xA6A6A6>'
-            case '4':
-                color = '<0x00B0F0>'
-            case '3':
-                color = '<0x00B050>'
-            case _:
-                color = ''
-        return self.workflowStatus.name + color
+        color = self.status_color
+        return self.workflowStatus.name + ('<0x%s>' % color if color is not None else '')
 
     @property
     def total_workload(self):
         return sum(map(lambda x: x.timeSpentSeconds, self.worklogs))
 
+    # 开始时间在 [start, end) 内的工作日志，边界为空时不限制
+    def worklogs_between(self, start: datetime = None, end: datetime = None):
+        begin_index = 0 if start is None else bisect_left(self.worklog_starts, start)
+        end_index = len(self.worklogs) if end is None else bisect_left(self.worklog_starts, end)
+        return self.worklogs[begin_index:end_index]
+
     @property
     def platform_string(self):
         if self.base_platform is None or self.base_platform.value == 'Other':
@@ -155,26 +182,31 @@ class Issue(IssueLike):
         return "%s, %s(%s): \n%s" % (comment.created_timestring, comment.created_author.key,
                                      comment.created_author.emailAddress, comment.body)
 
+    def generate_comment_strings(self, begin: int = None, end: int = None):
+        if self.comments:
+            return [self.__generate_comment_string(x, simple=True) for x in self.comments[begin:end]]
+        return ["### %s, Auto: \n### No comments." % datetime.now().strftime('%b %d, %a')]
+
     def generate_comments_series(self, begin: int = None, end: int = None):
-        def stringification(x: fieldsS.Comment):
-            return self.__generate_comment_string(x, simple=True)
+        import pandas as pd
 
-        if self.comments:
-            comment_list = list(map(stringification, self.comments[begin:end]))
-        else:
-            comment_list = ["### %s, Auto: \n### No comments." % datetime.now().strftime('%b %d, %a')]
-        return pd.Series(comment_list)
+        return pd.Series(self.generate_comment_strings(begin, end))
 
-    def get_comments_table(self, begin: int = None, end: int = None):
-        comments_series = self.generate_comments_series(begin, end)
-        summary = self.summary
+    # 评论快照的表头字段：(project, summary, labels, status)
+    def comments_status_head(self):
         labels = "[%s(%s)]%s" % (self.key, self.issueType.name, self.labels_string)
-        status = self.colored_status
-        comments_table = utils.concat_single_value(comments_series,
-                                                   left=[self.belongingProject.name, summary, labels, status],
-                                                   repeat=True,
-                                                   columns=['project', 'summary', 'labels', 'status', 'comments'])
-        return comments_table
+        return self.belongingProject.name, self.summary, labels, self.workflowStatus.name
+
+    # 评论快照的扁平记录，每条评论一行：(project, summary, labels, status, comments, status_color)
+    def comment_records(self, begin: int = None, end: int = None):
+        head = self.comments_status_head()
+        status_color = self.status_color
+        return [(*head, comment, status_color) for comment in self.generate_comment_strings(begin, end)]
+
+    def get_comments_table(self, begin: int = None, end: int = None):
+        import pandas as pd
+
+        return pd.DataFrame(self.comment_records(begin, end), columns=COMMENTS_COLUMNS)
 
 
 # Epic 型事务
@@ -194,18 +226,11 @@ class Epic(Issue):
             return None
         return '%s-%s' % (self.certification.parent.value, self.certification.child.value)
 
-    def get_comments_table(self, begin: int = None, end: int = None):
-        comments_series = self.generate_comments_series(begin, end)
+    def comments_status_head(self):
         summary = self.platform_string if self.platform_string is not None else self.summary
         labels = "[%s(%s)]%s" % (self.key, self.issueType.name,
                                  self.certification_string if self.certification else self.labels_string)
-        status = self.colored_status
-        comments_table = utils.concat_single_value(comments_series,
-                                                   [self.belongingProject.name, summary, labels, status],
-                                                   [],
-                                                   repeat=True,
-                                                   columns=['project', 'summary', 'labels', 'status', 'comments'])
-        return comments_table
+        return self.belongingProject.name, summary, labels, self.workflowStatus.name
 
 
 # 类任务型事务
@@ -219,6 +244,21 @@ class TaskLike(ABC, Issue):
     def generate_coordinate(self, epic: Issue, *, task: Issue = None) -> CoordinateCache:
         pass
 
+    # 坐标签名：包含 generate_coordinate 用到的全部输入，签名相同的事务生成相同的坐标
+    def coordinate_signature(self, epic: Issue, *, task: Issue = None):
+        def option_values(option: fieldsS.MultOptionValue | None):
+            return None if option is None else (option.parent.value, option.child.value)
+
+        return (
+            type(self),
+            type(task),
+            option_values(getattr(epic, 'certification', None)),
+            getattr(epic, 'epic_name', None),
+            self.components_tuple,
+            option_values(self.task_type),
+            option_values(task.task_type) if task is not None else None,
+        )
+
     @property
     def parent_key(self):
         if issubclass(self.__class__, Task):
@@ -403,6 +443,89 @@ class Subtask(TaskLike):
         return self.__gen_coord_as_public(epic)
 
 
+# 由原始 JSON 构造 jira Issue 对象（不绑定会话，仅用于解析字段）
+def _raw2issue_obj(raw: dict[str, Any]):
+    from jira.resources import Issue as JIRAIssue
+    return JIRAIssue(options={}, session=None, raw=raw)
+
+
+# 进程池解析：子进程持有的参考字段表，由 initializer 设置
+_worker_ref_fields: fieldsS.FieldList | None = None
+
+
+def _init_parsing_worker(ref_fields: fieldsS.FieldList):
+    global _worker_ref_fields
+    _worker_ref_fields = ref_fields
+
+
+# 扁平记录中可出现的类：事务类型及字段结构体
+_RECORD_CLASSES = {cls.__name__: cls for cls in (IssueLike, Issue, Epic, Task, TestTask, ManageTask, Subtask)}
+_RECORD_STRUCTS = {name: obj for name, obj in vars(fieldsS).items()
+                   if isinstance(obj, type) and hasattr(obj, '__dataclass_fields__')}
+
+
+# 子进程将解析结果打包为扁平记录发回父进程，避免逐个反序列化大量小对象：
+# 字段结构体（dataclass）去重后存入共享表，以 (表下标,) 引用；事务对象以 (类名, 属性值元组) 表示，属性名按类名单独发送
+class _RecordPacker:
+    def __init__(self):
+        self.keys: dict[str, tuple[str, ...]] = {}
+        self.table: list[tuple[str, tuple]] = []
+        self.__index: dict[tuple[str, tuple], int] = {}
+
+    def pack(self, value):
+        if isinstance(value, list):
+            return [self.pack(x) for x in value]
+        if isinstance(value, tuple):
+            raise TypeError("Tuple attribute can not be packed: %s." % (value,))
+        value_type = type(value)
+        names = getattr(value_type, '__dataclass_fields__', None)
+        if names is not None:
+            entry = (value_type.__name__, tuple(self.pack(getattr(value, name)) for name in names))
+            index = self.__index.get(entry)
+            if index is None:
+                index = self.__index[entry] = len(self.table)
+                self.table.append(entry)
+            return index,
+        if isinstance(value, IssueLike):
+            return self.pack_object(value)
+        return value
+
+    def pack_object(self, obj: IssueLike):
+        name = type(obj).__name__
+        keys = self.keys.setdefault(name, tuple(obj.__dict__))
+        return name, tuple(self.pack(obj.__dict__[key]) for key in keys)
+
+
+def _parse_raw_issues(raw_list: list[dict[str, Any]]):
+    packer = _RecordPacker()
+    records = [packer.pack_object(Issue.auto_adapt(_raw2issue_obj(raw), _worker_ref_fields)) for raw in raw_list]
+    return packer.keys, packer.table, records
+
+
+# 在父进程中由扁平记录重建事务对象，共享表中的结构体只构造一次
+def _unpack_records(keys: dict[str, tuple[str, ...]], table: list[tuple[str, tuple]], records: list[tuple[str, tuple]]):
+    structs = []
+
+    def unpack(value):
+        if isinstance(value, list):
+            return [unpack(x) for x in value]
+        if isinstance(value, tuple):
+            if len(value) == 1:
+                return structs[value[0]]
+            return unpack_object(*value)
+        return value
+
+    def unpack_object(name: str, values: tuple):
+        cls = _RECORD_CLASSES[name]
+        obj = cls.__new__(cls)
+        obj.__dict__.update(zip(keys[name], map(unpack, values)))
+        return obj
+
+    for name, fields in table:
+        structs.append(_RECORD_STRUCTS[name](*map(unpack, fields)))
+    return [unpack_object(*record) for record in records]
+
+
 class IssueList(list[Issue]):
     def __init__(self, field_obj_list: list[dict[str, Any]] = None):
         super().__init__()
@@ -410,25 +533,110 @@ class IssueList(list[Issue]):
         if field_obj_list is not None:
             self.__ref_fields = fieldsS.FieldList(field_obj_list)
 
-    def import_issues(self, issue_obj_list: list[jira_res.Issue]):
+    def import_issues(self, issue_obj_list: Iterable[jira_res.Issue]):
+        self.import_issue_pages([issue_obj_list], prefetch=False)
+
+    # 逐页导入：后台线程下载下一页的同时解析当前页，内存中只保留少量原始页数据
+    # 页内元素可以是 jira Issue 对象或其原始 JSON（dict）
+    # processes: 指定时在进程池中解析，原始 JSON 按 chunk_size 分块发送给子进程，进程数不超过 CPU 数
+    # auto_fallback: CPU 数或事务数不满足 PROCESS_MIN_CPUS/PROCESS_MIN_ISSUES 时忽略 processes，串行解析
+    def import_issue_pages(self, issue_obj_pages: Iterable[Iterable[jira_res.Issue | dict[str, Any]]], prefetch=True,
+                           processes: int = None, chunk_size: int = 50, auto_fallback=True):
         if self.__ref_fields is None:
             raise ValueError("This instance does not have a FieldList for reference, can not import issues.")
-        for issue_obj in issue_obj_list:
-            issue = Issue.auto_adapt(issue_obj, self.__ref_fields)
-            print("Import issue: [%s(%s)]%s." % (issue.key, issue.issueType.name, issue.summary))
-            self.append(issue)
-        print("Import completed! (Total=%d)\n" % len(issue_obj_list))
-
-    def get_comments_status(self, begin: int = None, end: int = None, filter_func: Callable[[Issue], bool] = None):
-        concat_list = []
+        reporter = utils.ProgressReporter('Import issue')
+        pages = utils.prefetching(issue_obj_pages) if prefetch else issue_obj_pages
+        if processes is not None and auto_fallback:
+            pages, processes = self.worth_processes(pages, processes)
+        if processes is not None:
+            self.__import_pages_by_processes(pages, reporter, processes, chunk_size)
+        else:
+            for page in pages:
+                reporter.set_total(getattr(page, 'total', None))
+                for issue_obj in page:
+                    if isinstance(issue_obj, dict):
+                        issue_obj = _raw2issue_obj(issue_obj)
+                    issue = Issue.auto_adapt(issue_obj, self.__ref_fields)
+                    self.append(issue)
+                    reporter.update(1, issue.info_string)
+        reporter.close()
+
+    # 逐页解析并产出每页的事务列表，本实例不保留解析出的事务，用于分块流式处理（参见 Matrix.streaming）
+    def iter_issue_pages(self, issue_obj_pages: Iterable[Iterable[jira_res.Issue | dict[str, Any]]], prefetch=True):
+        if self.__ref_fields is None:
+            raise ValueError("This instance does not have a FieldList for reference, can not import issues.")
+        pages = utils.prefetching(issue_obj_pages) if prefetch else issue_obj_pages
+        for page in pages:
+            chunk = IssueList()
+            chunk.__ref_fields = self.__ref_fields
+            for issue_obj in page:
+                if isinstance(issue_obj, dict):
+                    issue_obj = _raw2issue_obj(issue_obj)
+                chunk.append(Issue.auto_adapt(issue_obj, self.__ref_fields))
+            yield chunk
+
+    # 判断进程池解析是否有收益，返回 (页迭代器, 进程数或 None)
+    # 事务总数取自页的 total 属性；没有 total 时预读若干页，直到达到阈值或读完
+    @staticmethod
+    def worth_processes(pages: Iterable[Iterable[jira_res.Issue | dict[str, Any]]], processes: int):
+        cpu_count = os.cpu_count() or 1
+        if cpu_count < PROCESS_MIN_CPUS:
+            return pages, None
+        pages = iter(pages)
+        head = []
+        num_issues = 0
+        for page in pages:
+            page = page if isinstance(page, list) else list(page)
+            head.append(page)
+            num_issues += len(page)
+            total = getattr(page, 'total', None)
+            if total is not None:
+                num_issues = total
+                break
+            if num_issues >= PROCESS_MIN_ISSUES:
+                break
+        pages = itertools.chain(head, pages)
+        if num_issues < PROCESS_MIN_ISSUES:
+            return pages, None
+        return pages, min(processes, cpu_count)
+
+    def __import_pages_by_processes(self, pages: Iterable[Iterable[jira_res.Issue | dict[str, Any]]],
+                                    reporter: utils.ProgressReporter, processes: int, chunk_size: int):
+        # 按提交顺序收集结果，保证导入顺序与串行模式一致；在途分块数有上限以限制内存
+        in_flight = deque()
+
+        def collect():
+            for issue in _unpack_records(*in_flight.popleft().result()):
+                self.append(issue)
+                reporter.update(1, issue.info_string)
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_parsing_worker,
+                                 initargs=(self.__ref_fields,)) as executor:
+            for page in pages:
+                reporter.set_total(getattr(page, 'total', None))
+                raw_list = [getattr(issue_obj, 'raw', issue_obj) for issue_obj in page]
+                for start in range(0, len(raw_list), chunk_size):
+                    in_flight.append(executor.submit(_parse_raw_issues, raw_list[start:start + chunk_size]))
+                    if len(in_flight) > processes * 2:
+                        collect()
+            while in_flight:
+                collect()
+
+    # 一次遍历生成所有事务的评论快照记录，按 (project, summary, labels) 稳定排序
+    def get_comments_records(self, begin: int = None, end: int = None, filter_func: Callable[[Issue], bool] = None):
+        records = []
         for issue in self:
             if filter_func is not None and not filter_func(issue):
                 continue
-            concat_list.append(issue.get_comments_table(begin, end))
-        comments_table = pd.concat(concat_list)
-        comments_table.sort_values(by=list(comments_table.columns[[0, 1, 2]]), inplace=True)
-        comments_table.reset_index(drop=True, inplace=True)
-        return comments_table
+            records.extend(issue.comment_records(begin, end))
+        # 与 DataFrame.sort_values 一致，空值排在最后
+        records.sort(key=lambda x: tuple((value is None, '' if value is None else value) for value in x[:3]))
+        return records
+
+    def get_comments_status(self, begin: int = None, end: int = None, filter_func: Callable[[Issue], bool] = None):
+        import pandas as pd
+
+        return pd.DataFrame(self.get_comments_records(begin, end, filter_func), columns=COMMENTS_COLUMNS)
 
     def __listing_attribute(self, func: Callable[[Issue], str], assert_unique=True):
         attr_list = list(map(func, self))
@@ -473,3 +681,4 @@ def get_attribute_by_queue(attr_name: str, issue_queue: list[Issue]):
         if attr is not None:
             break
     return attr
+
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable
+
+
+# JIRA 元数据（字段列表、项目事务字段等）的磁盘缓存，带有效期（TTL）
+# 同一进程内的重复获取直接命中内存，不再重复读盘或请求服务器
+class MetadataCache:
+    DEFAULT_DIR = '.jira_cache'
+    DEFAULT_TTL = 24 * 3600
+
+    def __init__(self, cache_dir: str = DEFAULT_DIR, ttl: int | float = DEFAULT_TTL, force_refresh=False):
+        # ttl: 缓存有效期（秒），小于等于 0 时视为每次都过期
+        # force_refresh: 忽略磁盘缓存，本进程内每项元数据重新获取一次并回写
+        self.__dir = cache_dir
+        self.__ttl = ttl
+        self.__force = force_refresh
+        self.__memory: dict[str, Any] = {}
+        self.__lock = threading.RLock()
+
+    @property
+    def cache_dir(self):
+        return self.__dir
+
+    def __filepath(self, name: str):
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.__dir, digest + '.json')
+
+    def __read(self, name: str):
+        filepath = self.__filepath(name)
+        if not os.path.exists(filepath):
+            return None
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get('name') != name or time.time() - record.get('created', 0) > self.__ttl:
+            return None
+        return record
+
+    def __write(self, name: str, data: Any):
+        os.makedirs(self.__dir, exist_ok=True)
+        filepath = self.__filepath(name)
+        temp_filepath = filepath + '.%d.tmp' % os.getpid()
+        with open(temp_filepath, 'w', encoding='utf-8') as f:
+            json.dump({'name': name, 'created': time.time(), 'data': data}, f, ensure_ascii=False)
+        os.replace(temp_filepath, filepath)
+
+    def get(self, name: str, fetch: Callable[[], Any]):
+        # fetch 的返回值需要可以 JSON 序列化
+        # fetch 在锁外执行，多个线程可以同时获取不同的元数据
+        with self.__lock:
+            if name in self.__memory:
+                return self.__memory[name]
+            record = None if self.__force else self.__read(name)
+            if record is not None:
+                self.__memory[name] = record['data']
+                return record['data']
+        data = fetch()
+        with self.__lock:
+            if name in self.__memory:
+                return self.__memory[name]
+            try:
+                self.__write(name, data)
+            except OSError as e:
+                print("Writing metadata cache(%s) failed: %s." % (name, e))
+            self.__memory[name] = data
+            return data
+
+    def invalidate(self, name: str = None):
+        with self.__lock:
+            if name is None:
+                names = list(self.__memory.keys())
+                self.__memory.clear()
+                if os.path.isdir(self.__dir):
+                    for filename in os.listdir(self.__dir):
+                        if filename.endswith('.json'):
+                            os.remove(os.path.join(self.__dir, filename))
+                return names
+            self.__memory.pop(name, None)
+            filepath = self.__filepath(name)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return [name]
@@ -1,9 +1,21 @@
+from __future__ import annotations
 import re
-import pandas as pd
-from datetime import datetime
-from dateutil.parser import parse
+from datetime import date, datetime, timedelta, timezone
 import math
-from wcwidth import wcswidth
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, TypeVar, TYPE_CHECKING
+
+# pandas/dateutil/wcwidth 在用到的函数内按需导入，缩短启动耗时
+if TYPE_CHECKING:
+    import pandas as pd
+
+_T = TypeVar('_T')
+# JIRA REST 接口的时间格式，例如 2025-01-01T10:00:00.000+0800
+JIRA_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+# 报表时区（JIRA 服务器所在时区）：工作日志时间统一换算到该时区后比较、排序及分区间统计，报表时间窗口的边界也按该时区解释
+REPORT_TIMEZONE = timezone(timedelta(hours=8))
 
 
 def clean_string(string: str):
@@ -21,11 +33,55 @@ def parse_timestring(timestring: str, time_format: str = None):
     if time_format:
         return datetime.strptime(timestring, time_format)
     else:
+        from dateutil.parser import parse
         return parse(timestring)
 
 
+# 解析 JIRA 时间字符串，换算到报表时区后返回不带时区信息的时间，便于与报表时间窗口比较
+# 不同时区记录的时间先统一时区，避免按各自的本地时间排序及截取；不带时区的时间视为报表时区
+def parse_jira_time(timestring: str):
+    try:
+        moment = datetime.strptime(timestring, JIRA_TIME_FORMAT)
+    except ValueError:
+        moment = parse_timestring(timestring)
+    return to_report_time(moment)
+
+
+def to_report_time(moment: datetime):
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(REPORT_TIMEZONE).replace(tzinfo=None)
+
+
+# 规范化报表时间窗口为半开区间 [start, end)：date 类型的 end 包含当天，datetime 类型的 end 不包含该时刻
+# 边界按报表时区解释，带时区的 datetime 先换算到报表时区
+def normalize_window(start: date | datetime = None, end: date | datetime = None):
+    if start is not None:
+        start = to_report_time(start) if isinstance(start, datetime) else datetime(start.year, start.month, start.day)
+    if end is not None:
+        end = to_report_time(end) if isinstance(end, datetime) \
+            else datetime(end.year, end.month, end.day) + timedelta(days=1)
+    if start is not None and end is not None and start >= end:
+        raise ValueError("The window start(%s) should be earlier than the end(%s)." % (start, end))
+    return start, end
+
+
+# 时间所在的统计区间起点：month 为当月 1 日，week 为当周周一，day 为当天
+def time_bucket(moment: datetime, bucket: str = 'month'):
+    if bucket == 'month':
+        return date(moment.year, moment.month, 1)
+    elif bucket == 'week':
+        return moment.date() - timedelta(days=moment.weekday())
+    elif bucket == 'day':
+        return moment.date()
+    else:
+        raise ValueError("Unknown bucket: %s." % bucket)
+
+
 def concat_single_value(centre: pd.Series | pd.DataFrame, left: list = None, right: list = None, repeat: bool = True,
                         columns: list[str] = None):
+    import pandas as pd
+
     def item2series(x):
         return pd.Series([x] * (centre.shape[0] if repeat else 1))
 
@@ -46,6 +102,7 @@ def concat_single_value(centre: pd.Series | pd.DataFrame, left: list = None, rig
 
 
 def specific_length_string(origin: str, length: int = 80, suffix: str = '...'):
+    from wcwidth import wcswidth
     shorter = ''
     for i in range(len(origin)):
         shorter = origin[:i + 1]
@@ -54,3 +111,71 @@ def specific_length_string(origin: str, length: int = 80, suffix: str = '...'):
             break
     tab = '\t' * (math.ceil((length + len(suffix)) / 4) - math.floor(wcswidth(shorter) / 4))
     return shorter + tab
+
+
+# 在后台线程中预取 iterable 的后续元素（例如下一页搜索结果），与调用方的处理过程重叠
+def prefetching(iterable: Iterable[_T], buffer_size: int = 1) -> Iterator[_T]:
+    buffer = queue.Queue(maxsize=max(buffer_size, 1))
+    end_mark = object()
+    stop_event = threading.Event()
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((end_mark, e))
+            return
+        put((end_mark, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is end_mark:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop_event.set()
+
+
+# 限频进度输出：两次输出间隔不小于 interval 秒
+class ProgressReporter:
+    def __init__(self, label: str, total: int = None, interval: float = 1.0):
+        self.__label = label
+        self.__total = total
+        self.__interval = interval
+        self.__count = 0
+        self.__last = time.monotonic()
+
+    @property
+    def count(self):
+        return self.__count
+
+    def set_total(self, total: int | None):
+        self.__total = total
+
+    def update(self, step: int = 1, detail: str = None):
+        self.__count += step
+        now = time.monotonic()
+        if now - self.__last < self.__interval:
+            return
+        self.__last = now
+        progress = '%d/%d' % (self.__count, self.__total) if self.__total else '%d' % self.__count
+        print("%s: %s%s" % (self.__label, progress, ' ' + detail if detail else ''))
+
+    def close(self):
+        print("%s completed! (Total=%d)\n" % (self.__label, self.__count))
@@ -1,10 +1,19 @@
+from __future__ import annotations
 import re
-from typing import Callable, Any
+from typing import Callable, Any, TYPE_CHECKING
 from openpyxl import Workbook
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
 from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
 from openpyxl.styles import Border, Side, PatternFill
-from matplotlib.colors import LinearSegmentedColormap, Colormap
+from openpyxl.formatting.rule import CellIsRule, ColorScaleRule, FormulaRule
 from copy import copy
+from functools import partial
+
+# numpy 仅在整块着色时按需导入
+if TYPE_CHECKING:
+    import numpy as np
 
 
 class RCActivator:
@@ -194,6 +203,12 @@ class WorksheetProcessor:
         for key, dim in source_ws.column_dimensions.items():
             target_ws.column_dimensions[key].width = dim.width
         target_ws.merged_cells = copy(source_ws.merged_cells)
+        # 条件格式规则逐条复制（含差异样式 dxf），添加时会改写规则的优先级，不能与源工作表共用同一对象
+        for cf in source_ws.conditional_formatting:
+            for rule in cf.rules:
+                rule_copy = copy(rule)
+                rule_copy.dxf = copy(rule.dxf)
+                target_ws.conditional_formatting.add(str(cf.sqref), rule_copy)
         return target_ws
 
     # 向 target_ws 复制 source_ws 的部分内容及格式
@@ -211,12 +226,18 @@ class WorksheetProcessor:
             offset_r, offset_c = to_op_r - from_row_scope[0], to_op_c - from_col_scope[0]
         else:
             offset_r, offset_c = 0, 0
+        # 同一工作簿内共享样式表，直接复制样式索引
+        same_workbook = source_ws.parent is target_ws.parent
         for from_row in from_row_range:
             for from_col in from_col_range:
                 src_cell = source_ws.cell(from_row, from_col)
                 tar_cell = target_ws.cell(from_row + offset_r, from_col + offset_c)
                 tar_cell.value = src_cell.value
-                if src_cell.has_style:
+                if not src_cell.has_style:
+                    continue
+                if same_workbook:
+                    tar_cell._style = copy(getattr(src_cell, '_style'))
+                else:
                     tar_cell.alignment = copy(src_cell.alignment)
                     tar_cell.border = copy(src_cell.border)
                     tar_cell.fill = copy(src_cell.fill)
@@ -242,6 +263,54 @@ class WorksheetProcessor:
         return target_ws
 
 
+# 样式对象缓存：参数相同的样式对象只构造一次，各单元格按引用共享
+class StyleCache:
+    __cache: dict[tuple, Any] = {}
+    # (id(base), changes) -> (base, derived)：同一列的单元格通常共享同一个样式对象，按身份命中可免去哈希整个样式对象
+    __derived_by_id: dict[tuple, tuple[Any, Any]] = {}
+
+    @classmethod
+    def get(cls, style_class: type, **kwargs):
+        key = (style_class, *sorted(kwargs.items()))
+        style_obj = cls.__cache.get(key)
+        if style_obj is None:
+            style_obj = cls.__cache.setdefault(key, style_class(**kwargs))
+        return style_obj
+
+    # 在已有样式对象基础上修改部分属性（例如单元格当前的 font/alignment）
+    @classmethod
+    def derive(cls, base: Any, **changes):
+        # 单元格的样式属性为 StyleProxy（不可哈希），取其包装的样式对象
+        base = getattr(base, '_StyleProxy__target', base)
+        changes_key = tuple(sorted(changes.items()))
+        derived = cls.__derived_by_id.get((id(base), changes_key))
+        if derived is not None and derived[0] is base:
+            return derived[1]
+        key = ('derive', base, *changes_key)
+        style_obj = cls.__cache.get(key)
+        if style_obj is None:
+            style_obj = copy(base)
+            for attr, value in changes.items():
+                setattr(style_obj, attr, value)
+            style_obj = cls.__cache.setdefault(key, style_obj)
+        cls.__derived_by_id[(id(base), changes_key)] = (base, style_obj)
+        return style_obj
+
+    @classmethod
+    def border(cls, border_style='thin', color='FF000000'):
+        side = cls.get(Side, border_style=border_style, color=color)
+        return cls.get(Border, left=side, right=side, top=side, bottom=side)
+
+    @classmethod
+    def fill(cls, color: str, fill_type='solid'):
+        return cls.get(PatternFill, patternType=fill_type, fgColor=color.upper())
+
+    @classmethod
+    def clear(cls):
+        cls.__cache.clear()
+        cls.__derived_by_id.clear()
+
+
 class CellSetting:
     ALIGNMENT_HORIZONTAL = ['general', 'left', 'center', 'right', 'fill', 'justify', 'centerContinuous', 'distributed']
     ALIGNMENT_VERTICAL = ['top', 'center', 'bottom', 'justify', 'distributed']
@@ -251,98 +320,152 @@ class CellSetting:
                  "gray0625", "gray125", "lightDown", "lightGray", "lightGrid", "lightHorizontal", "lightTrellis",
                  "lightUp", "lightVertical", "mediumGray", "none"]
 
-    # 设置单元格文本对齐
     @classmethod
-    def setting_text_alignment(cls, ws: Worksheet, row: int, col: int, horizontal='left', vertical='center'):
+    def __check_alignment(cls, horizontal: str, vertical: str):
         if horizontal not in cls.ALIGNMENT_HORIZONTAL:
             raise ValueError("Invalid horizontal: %s, excepted input: %s." % (horizontal, cls.ALIGNMENT_HORIZONTAL))
         if vertical not in cls.ALIGNMENT_VERTICAL:
             raise ValueError("Invalid vertical: %s, excepted input: %s." % (vertical, cls.ALIGNMENT_VERTICAL))
-        align = ws.cell(row, col).alignment
+
+    @classmethod
+    def __check_border_style(cls, border_style: str):
+        if border_style not in cls.BORDER_STYLE:
+            raise ValueError("Invalid border_style: %s, excepted input: %s" % (border_style, cls.BORDER_STYLE))
+
+    @classmethod
+    def __check_fill_type(cls, fill_type: str):
+        if fill_type not in cls.FILL_TYPE:
+            raise ValueError("Invalid fill_type: %s, excepted input: %s" % (fill_type, cls.FILL_TYPE))
+
+    # 以下 apply_* 直接作用于单元格对象，不做参数检查
+    @staticmethod
+    def apply_text_alignment(cell: Cell, horizontal='left', vertical='center'):
+        align = cell.alignment
         if align.horizontal != horizontal or align.vertical != vertical:
-            align_new = copy(align)
-            if align.horizontal != horizontal:
-                align_new.horizontal = horizontal
-            if align.vertical != vertical:
-                align_new.vertical = vertical
-            ws.cell(row, col).alignment = align_new
+            cell.alignment = StyleCache.derive(align, horizontal=horizontal, vertical=vertical)
 
-    # 设置单元格文本自动换行
     @staticmethod
-    def setting_word_wrap(ws: Worksheet, row: int, col: int):
-        align = ws.cell(row, col).alignment
+    def apply_word_wrap(cell: Cell):
+        align = cell.alignment
         if not align.wrapText:
-            align_new = copy(align)
-            align_new.wrapText = True
-            ws.cell(row, col).alignment = align_new
+            cell.alignment = StyleCache.derive(align, wrapText=True)
+
+    @staticmethod
+    def apply_cell_border(cell: Cell, border_style='thin'):
+        cell.border = StyleCache.border(border_style)
+
+    @staticmethod
+    def apply_fill_color(cell: Cell, color: str, fill_type='solid'):
+        cell.fill = StyleCache.fill(color, fill_type)
+
+    @classmethod
+    def apply_fill_color_by_re(cls, cell: Cell, re_pattern: re.Pattern, fill_type='solid'):
+        content = cell.value
+        # 被合并隐藏的单元格没有值
+        if type(content) is not str:
+            return
+        search_result = re_pattern.search(content)
+        if not search_result:
+            return
+        color = search_result.groups()[1]
+        cell.value = re_pattern.sub('', content)
+        cls.apply_fill_color(cell, color, fill_type)
+
+    @classmethod
+    def apply_fill_color_by_picker(cls, cell: Cell, color_picker: Callable[[Any], str], fill_type='solid'):
+        color = color_picker(cell.value)
+        if color:
+            cls.apply_fill_color(cell, color, fill_type)
+
+    @staticmethod
+    def apply_basic_font(cell: Cell, name: str = None, size: int = None, bold: bool = None, color: str = None,
+                         italic: bool = None, strike: bool = None):
+        changes = {attr: value for attr, value in (('name', name), ('size', size), ('bold', bold), ('color', color),
+                                                   ('italic', italic), ('strike', strike)) if value}
+        cell.font = StyleCache.derive(cell.font, **changes)
+
+    # 设置单元格文本对齐
+    @classmethod
+    def setting_text_alignment(cls, ws: Worksheet, row: int, col: int, horizontal='left', vertical='center'):
+        cls.__check_alignment(horizontal, vertical)
+        cls.apply_text_alignment(ws.cell(row, col), horizontal, vertical)
+
+    # 设置单元格文本自动换行
+    @classmethod
+    def setting_word_wrap(cls, ws: Worksheet, row: int, col: int):
+        cls.apply_word_wrap(ws.cell(row, col))
 
     # 设置单元格边框
     @classmethod
     def setting_cell_border(cls, ws: Worksheet, row: int, col: int, border_style='thin'):
-        if border_style not in cls.BORDER_STYLE:
-            raise ValueError("Invalid border_style: %s, excepted input: %s" % (border_style, cls.BORDER_STYLE))
-        ws.cell(row, col).border = Border(left=Side(border_style=border_style, color='FF000000'),
-                                          right=Side(border_style=border_style, color='FF000000'),
-                                          top=Side(border_style=border_style, color='FF000000'),
-                                          bottom=Side(border_style=border_style, color='FF000000'))
+        cls.__check_border_style(border_style)
+        cls.apply_cell_border(ws.cell(row, col), border_style)
 
     # 设置单元格颜色
     @classmethod
     def setting_fill_color(cls, ws: Worksheet, row: int, col: int, color: str, fill_type='solid'):
-        if fill_type not in cls.FILL_TYPE:
-            raise ValueError("Invalid fill_type: %s, excepted input: %s" % (fill_type, cls.FILL_TYPE))
-        type_index = cls.FILL_TYPE.index(fill_type)
-        ws.cell(row, col).fill = PatternFill(patternType=cls.FILL_TYPE[type_index], fgColor=color.upper())
+        cls.__check_fill_type(fill_type)
+        cls.apply_fill_color(ws.cell(row, col), color, fill_type)
 
     # 设置单元格颜色 by re
     @classmethod
     def setting_fill_color_by_re(cls, ws: Worksheet, row: int, col: int, re_pattern: re.Pattern, fill_type='solid'):
-        content = ws.cell(row, col).value
-        search_result = re_pattern.search(content)
-        if not search_result:
-            return
-        color = search_result.groups()[1]
-        ws.cell(row, col).value = re_pattern.sub('', content)
-        cls.setting_fill_color(ws, row, col, color, fill_type)
+        cls.__check_fill_type(fill_type)
+        cls.apply_fill_color_by_re(ws.cell(row, col), re_pattern, fill_type)
 
     # 设置单元格颜色 by picker
     @classmethod
     def setting_fill_color_by_picker(cls, ws: Worksheet, row: int, col: int, color_picker: Callable[[Any], str],
                                      fill_type='solid'):
-        content = ws.cell(row, col).value
-        # try:
-        #     num = float(content)
-        # except ValueError:
-        #     return
-        color = color_picker(content)
-        if color:
-            cls.setting_fill_color(ws, row, col, color, fill_type)
+        cls.__check_fill_type(fill_type)
+        cls.apply_fill_color_by_picker(ws.cell(row, col), color_picker, fill_type)
 
     # 设置单元格文本字体
-    @staticmethod
-    def setting_basic_font(ws: Worksheet, row: int, col: int, name: str = None, size: int = None, bold: bool = None,
-                           color: str = None, italic: bool = None, strike: bool = None):
-        font_new = copy(ws.cell(row, col).font)
-        if name:
-            font_new.name = name
-        if size:
-            font_new.size = size
-        if bold:
-            font_new.bold = bold
-        if color:
-            font_new.color = color
-        if italic:
-            font_new.italic = italic
-        if strike:
-            font_new.strike = strike
-        ws.cell(row, col).font = font_new
+    @classmethod
+    def setting_basic_font(cls, ws: Worksheet, row: int, col: int, name: str = None, size: int = None,
+                           bold: bool = None, color: str = None, italic: bool = None, strike: bool = None):
+        cls.apply_basic_font(ws.cell(row, col), name, size, bold, color, italic, strike)
+
+    # 结果只取决于单元格原有样式、与单元格值无关的 setter
+    @classmethod
+    def is_uniform(cls, setter: Callable[..., None]):
+        return getattr(setter, '__self__', None) is cls and getattr(setter, '__name__', None) in [
+            'setting_text_alignment', 'setting_word_wrap', 'setting_cell_border', 'setting_fill_color',
+            'setting_basic_font']
+
+    # 将 setting_* 及其参数转换为作用于单元格对象的函数，参数检查只做一次；未知的 setter 按 (ws, row, col) 方式调用
+    @classmethod
+    def cell_applier(cls, setter: Callable[..., None], **kwargs) -> Callable[[Cell], None]:
+        setter_name = getattr(setter, '__name__', None)
+        if getattr(setter, '__self__', None) is not cls:
+            setter_name = None
+        if setter_name == 'setting_text_alignment':
+            cls.__check_alignment(kwargs.get('horizontal', 'left'), kwargs.get('vertical', 'center'))
+            return partial(cls.apply_text_alignment, **kwargs)
+        if setter_name == 'setting_word_wrap':
+            return partial(cls.apply_word_wrap, **kwargs)
+        if setter_name == 'setting_cell_border':
+            cls.__check_border_style(kwargs.get('border_style', 'thin'))
+            return partial(cls.apply_cell_border, **kwargs)
+        if setter_name in ['setting_fill_color', 'setting_fill_color_by_re', 'setting_fill_color_by_picker']:
+            cls.__check_fill_type(kwargs.get('fill_type', 'solid'))
+            return partial(getattr(cls, setter_name.replace('setting_', 'apply_')), **kwargs)
+        if setter_name == 'setting_basic_font':
+            return partial(cls.apply_basic_font, **kwargs)
+
+        def apply(cell: Cell):
+            setter(cell.parent, cell.row, cell.column, **kwargs)
+
+        return apply
 
 
 class WorksheetShell:
-    __slots__ = '__ws'
+    __slots__ = '__ws', '__merge_plans'
 
     def __init__(self, worksheet: Worksheet):
         self.__ws = worksheet
+        # 列号 -> 该列已执行的纵向合并区间
+        self.__merge_plans: dict[int, list[tuple[int, int]]] = {}
 
     @property
     def worksheet(self):
@@ -365,56 +488,55 @@ class WorksheetShell:
     def _activate_scope(self, scope_str: str):
         return RCActivator.activate_scope(self.__ws, scope_str)
 
+    # 规划纵向合并：每列的值只读取一次，按 VerticalMergePlanner 的规则计算合并区间，返回 {列号: [(起始行, 结束行)]}
+    def plan_merge_cells_vertical(self, row_begin: int, row_end: int, col_begin: int, col_end: int, mode: str):
+        plans: dict[int, list[tuple[int, int]]] = {}
+        if row_end < row_begin:
+            return {col: [] for col in range(col_begin, col_end + 1)}
+        for col, column_values in zip(range(col_begin, col_end + 1),
+                                      self.__ws.iter_cols(min_row=row_begin, max_row=row_end,
+                                                          min_col=col_begin, max_col=col_end, values_only=True)):
+            planner = VerticalMergePlanner(mode, row_begin)
+            for cell_content in column_values:
+                planner.feed(cell_content)
+            plans[col] = planner.close()
+        return plans
+
+    # 按合并规划以整数坐标合并单元格，并记录规划供 copy_merge_cells_vertical 复用
+    def apply_merge_plan(self, plans: dict[int, list[tuple[int, int]]]):
+        for col, runs in plans.items():
+            for begin, end in runs:
+                self.__ws.merge_cells(start_row=begin, start_column=col, end_row=end, end_column=col)
+            self.__merge_plans[col] = runs
+
     def __merge_cells_vertical(self, row_begin: int, row_end: int, col_begin: int, col_end: int, mode: str):
-        excepted_mode = ['nan', 'same', 'all']
-        if mode not in excepted_mode:
-            raise ValueError("Merge mode should be: " + str(excepted_mode) + ", but given: " + str(mode))
-        for col in range(col_begin, col_end + 1):
-            start = row_begin
-            end = row_begin
-            last_str = ''
-            for row in range(row_begin, row_end + 2):
-                if row <= row_end:
-                    cell_content = self.__ws.cell(row, col).value
-                else:
-                    cell_content = ''
-                if (row > row_end
-                        or (mode == 'nan' and type(cell_content) is str)
-                        or (mode == 'same' and cell_content != last_str)
-                        or (mode == 'all' and type(cell_content) is str and cell_content != last_str)):
-                    if row_begin <= start < end <= row_end:
-                        self.__ws.merge_cells(':'.join([RCActivator.point_int2str(start, col),
-                                                        RCActivator.point_int2str(end, col)]))
-                    start = row
-                    if mode in ['same', 'all']:
-                        last_str = cell_content
-                end = row
+        self.apply_merge_plan(self.plan_merge_cells_vertical(row_begin, row_end, col_begin, col_end, mode))
 
     # 批量设置纵向单元格合并
     def batch_merge_cells_vertical(self, *, scope='', col_list: list = None, mode='all'):
         if col_list:
             act_col_list = self._activate_col_list(col_list)
+            max_row = self.max_row
             for col in act_col_list:
-                self.__merge_cells_vertical(1, self.max_row, col, col, mode=mode)
+                self.__merge_cells_vertical(1, max_row, col, col, mode=mode)
         else:
             row_scope, col_scope = self._activate_scope(scope)
             self.__merge_cells_vertical(*row_scope, *col_scope, mode=mode)
 
-    # 复制纵向单元格合并
+    # 复制纵向单元格合并：参考列已由本对象规划合并时直接复用规划，否则扫描工作表的合并区域
     def copy_merge_cells_vertical(self, refer_col: int | str, target_col: int | str | list[int | str]):
         act_refer_col = self._activate_col(refer_col)
         if type(target_col) is list:
             act_target_col = self._activate_col_list(target_col)
         else:
             act_target_col = [self._activate_col(target_col)]
-        merge_list = []
-        for merge_area in self.__ws.merged_cells:
-            if merge_area.min_col == merge_area.max_col == act_refer_col:
-                merge_list.append((merge_area.min_row, merge_area.max_row))
-        for col in act_target_col:
-            for begin, end in merge_list:
-                self.__ws.merge_cells(':'.join([RCActivator.point_int2str(begin, col),
-                                                RCActivator.point_int2str(end, col)]))
+        merge_list = self.__merge_plans.get(act_refer_col)
+        if merge_list is None:
+            merge_list = []
+            for merge_area in self.__ws.merged_cells:
+                if merge_area.min_col == merge_area.max_col == act_refer_col:
+                    merge_list.append((merge_area.min_row, merge_area.max_row))
+        self.apply_merge_plan({col: merge_list for col in act_target_col})
 
     # 批量设置列宽
     def batch_set_column_width(self, width_dict: dict[int | str, int]):
@@ -441,13 +563,278 @@ class WorksheetShell:
             for j in col_range:
                 func(self.__ws, i, j, **kwargs)
 
+    # 多规则单次遍历批量设置单元格：rules 为 (setter, col_list, kwargs) 列表，col_list 为空时作用于 scope 内所有列
+    # 所有规则共用 scope 的行范围，按规则顺序依次作用于每个单元格
+    # 每列开头与单元格值无关的规则（见 CellSetting.is_uniform）按单元格原有样式只合成一次，原有样式相同的单元格直接套用合成结果；
+    # scope 为空（整表）时这些规则同时写入列默认样式，该列中没有单元格对象的位置也按此样式显示
+    def batch_set_rules(self, rules: list[tuple[Callable[..., None], list | None, dict[str, Any] | None]], scope=''):
+        row_scope, col_scope = self._activate_scope(scope)
+        col_rules: dict[int, list[tuple[bool, Callable[[Cell], None]]]] = {}
+        for setter, col_list, kwargs in rules:
+            applier = CellSetting.cell_applier(setter, **(kwargs or {}))
+            if col_list:
+                act_col_list = self._activate_col_list(col_list)
+            else:
+                act_col_list = range(col_scope[0], col_scope[1] + 1)
+            for col in act_col_list:
+                col_rules.setdefault(col, []).append((CellSetting.is_uniform(setter), applier))
+        if not col_rules:
+            return
+        min_col, max_col = min(col_rules.keys()), max(col_rules.keys())
+        # 每列拆分为开头的值无关规则及其余规则，值无关规则的合成结果按原有样式（StyleArray）缓存
+        col_plans = []
+        for col in range(min_col, max_col + 1):
+            appliers = col_rules.get(col, [])
+            uniform_count = 0
+            while uniform_count < len(appliers) and appliers[uniform_count][0]:
+                uniform_count += 1
+            uniform = [applier for _, applier in appliers[:uniform_count]]
+            others = [applier for _, applier in appliers[uniform_count:]]
+            col_plans.append((uniform, others, {}))
+            if not scope and uniform:
+                column_dimension = self.__ws.column_dimensions[RCActivator.num2alpha(col)]
+                for applier in uniform:
+                    applier(column_dimension)
+        for row_cells in self.__ws.iter_rows(min_row=row_scope[0], max_row=row_scope[1],
+                                             min_col=min_col, max_col=max_col):
+            for cell, (uniform, others, composed) in zip(row_cells, col_plans):
+                if uniform:
+                    style = composed.get(cell._style)
+                    if style is None:
+                        base = copy(cell._style)
+                        for applier in uniform:
+                            applier(cell)
+                        composed[base] = copy(cell._style)
+                    else:
+                        cell._style = copy(style)
+                for applier in others:
+                    applier(cell)
+
+
+# 纵向合并规划器：逐行输入某列的值，按 nan/same/all 模式计算需要合并的行区间（与 WorksheetShell 的纵向合并规则一致）
+class VerticalMergePlanner:
+    EXCEPTED_MODE = ['nan', 'same', 'all']
+    __slots__ = '__mode', '__row', '__start', '__end', '__last', '__runs'
+
+    def __init__(self, mode='all', row_begin: int = 1):
+        if mode not in self.EXCEPTED_MODE:
+            raise ValueError("Merge mode should be: " + str(self.EXCEPTED_MODE) + ", but given: " + str(mode))
+        self.__mode = mode
+        self.__row = row_begin
+        self.__start = row_begin
+        self.__end = row_begin
+        self.__last = ''
+        self.__runs: list[tuple[int, int]] = []
+
+    def __is_boundary(self, cell_content: Any):
+        mode = self.__mode
+        return ((mode == 'nan' and type(cell_content) is str)
+                or (mode == 'same' and cell_content != self.__last)
+                or (mode == 'all' and type(cell_content) is str and cell_content != self.__last))
+
+    def __close_run(self):
+        if self.__start < self.__end:
+            self.__runs.append((self.__start, self.__end))
+
+    # 输入下一行的值，返回该行是否并入上方的合并区间（即合并后被隐藏的单元格）
+    def feed(self, cell_content: Any):
+        boundary = self.__is_boundary(cell_content)
+        if boundary:
+            self.__close_run()
+            self.__start = self.__row
+            if self.__mode in ['same', 'all']:
+                self.__last = cell_content
+        self.__end = self.__row
+        self.__row += 1
+        return not boundary
+
+    # 结束输入，返回 (起始行, 结束行) 列表
+    def close(self):
+        self.__close_run()
+        self.__start = self.__end = self.__row
+        return self.__runs
+
+
+# 流式（write_only）工作表写入器：每行按最终样式一次写出，纵向合并在写入过程中规划，内存占用与行数无关
+# 列宽需在写入第一行前设置
+class StreamingSheetWriter:
+    STYLE_KEYS = ['alignment', 'border', 'fill', 'font']
+    __slots__ = '__ws', '__col_styles', '__default_style', '__processors', '__planners', '__copy_merges', '__closed'
+
+    def __init__(self, worksheet: WriteOnlyWorksheet):
+        if type(worksheet) is not WriteOnlyWorksheet:
+            raise TypeError("The type of worksheet should be WriteOnlyWorksheet.")
+        self.__ws = worksheet
+        self.__col_styles: dict[int, dict[str, Any]] = {}
+        self.__default_style: dict[str, Any] = {}
+        self.__processors: dict[int, Callable[[Any], tuple[Any, dict[str, Any]]]] = {}
+        self.__planners: dict[int, VerticalMergePlanner] = {}
+        self.__copy_merges: dict[int, list[int]] = {}
+        self.__closed = False
+
+    @property
+    def worksheet(self):
+        return self.__ws
+
+    @staticmethod
+    def _activate_col(col: int | str):
+        act_col = RCActivator.alpha2num(col) if type(col) is str else col
+        if type(act_col) is not int or act_col <= 0:
+            raise ValueError("Invalid col: %s." % col)
+        return act_col
+
+    @classmethod
+    def __check_style(cls, style: dict[str, Any]):
+        for key in style.keys():
+            if key not in cls.STYLE_KEYS:
+                raise ValueError("Invalid style key: %s, excepted input: %s." % (key, cls.STYLE_KEYS))
+        return style
+
+    # 批量设置列宽
+    def batch_set_column_width(self, width_dict: dict[int | str, int]):
+        for col, width in width_dict.items():
+            if not isinstance(width, (int, float)):
+                raise ValueError("Invalid width type: %s." % type(width))
+            if width <= 0:
+                raise ValueError("The column width should be positive, but given: %s" % width)
+            self.__ws.column_dimensions[RCActivator.num2alpha(self._activate_col(col))].width = width
+
+    # 设置列样式（alignment/border/fill/font），col_list 为空时设置所有列的默认样式，样式对象在各单元格间共享
+    def set_column_style(self, col_list: list[int | str] = None, **style):
+        self.__check_style(style)
+        if not col_list:
+            self.__default_style.update(style)
+            return
+        for col in col_list:
+            self.__col_styles.setdefault(self._activate_col(col), {}).update(style)
+
+    # 设置列值处理函数：func(value) -> (new_value, style)，style 覆盖该单元格的列样式
+    def set_value_processor(self, col: int | str, func: Callable[[Any], tuple[Any, dict[str, Any]]]):
+        self.__processors[self._activate_col(col)] = func
+
+    # 规划纵向单元格合并
+    def plan_merge_cells_vertical(self, col_list: list[int | str], mode='all'):
+        for col in col_list:
+            self.__planners[self._activate_col(col)] = VerticalMergePlanner(mode)
+
+    # 复制纵向单元格合并
+    def copy_merge_cells_vertical(self, refer_col: int | str, target_col: int | str | list[int | str]):
+        act_refer_col = self._activate_col(refer_col)
+        if act_refer_col not in self.__planners:
+            raise ValueError("The refer_col(%s) has no merge plan." % refer_col)
+        target_col_list = target_col if type(target_col) is list else [target_col]
+        self.__copy_merges.setdefault(act_refer_col, []).extend(map(self._activate_col, target_col_list))
+
+    # cell_styles: 本行单元格的样式提示 {列: style}，覆盖列样式及值处理函数给出的样式
+    def append(self, row_content: list | tuple, cell_styles: dict[int | str, dict[str, Any]] = None):
+        raw_values = list(row_content)
+        values = list(raw_values)
+        styles = []
+        for j in range(1, len(values) + 1):
+            style = self.__col_styles.get(j)
+            if j in self.__processors:
+                values[j - 1], cell_style = self.__processors[j](values[j - 1])
+                if cell_style:
+                    style = {**(style or {}), **self.__check_style(cell_style)}
+            styles.append(style)
+        if cell_styles:
+            for col, cell_style in cell_styles.items():
+                j = self._activate_col(col)
+                if j <= len(styles):
+                    styles[j - 1] = {**(styles[j - 1] or {}), **self.__check_style(cell_style)}
+        # 合并规划基于原始值；被合并隐藏的单元格不保留值（与 merge_cells 行为一致）
+        for col, planner in self.__planners.items():
+            merged = planner.feed(raw_values[col - 1] if col <= len(raw_values) else None)
+            if merged:
+                for act_col in [col] + self.__copy_merges.get(col, []):
+                    if act_col <= len(values):
+                        values[act_col - 1] = None
+        row = []
+        for value, style in zip(values, styles):
+            cell = WriteOnlyCell(self.__ws, value=value)
+            for key, style_obj in self.__default_style.items():
+                setattr(cell, key, style_obj)
+            if style:
+                for key, style_obj in style.items():
+                    setattr(cell, key, style_obj)
+            row.append(cell)
+        self.__ws.append(row)
+
+    # 结束写入，写入规划好的合并区域
+    def close(self):
+        if self.__closed:
+            return self.__ws
+        for col, planner in self.__planners.items():
+            runs = planner.close()
+            for act_col in [col] + self.__copy_merges.get(col, []):
+                for begin, end in runs:
+                    self.__ws.merged_cells.add(CellRange(min_col=act_col, min_row=begin, max_col=act_col, max_row=end))
+        self.__closed = True
+        return self.__ws
+
+
+# 线性分段颜色映射，取色结果与 matplotlib.colors.LinearSegmentedColormap.from_list(name, colors, N) 一致，
+# 用于避免仅为构造热力图颜色而导入 matplotlib
+class LinearColormap:
+    __slots__ = 'name', 'N', '__lut'
+
+    def __init__(self, name: str, lut: list[tuple[float, float, float, float]]):
+        self.name = name
+        self.N = len(lut)
+        self.__lut = lut
+
+    @classmethod
+    def from_list(cls, name: str, colors: list[tuple[float, ...]], N: int = 256):
+        # colors: 等距分布的 (r, g, b) 或 (r, g, b, a) 锚点颜色，分量取值 0~1
+        rgba_list = [tuple(map(float, color)) + (1.0,) * (4 - len(color)) for color in colors]
+        # 与 numpy.linspace 相同的计算方式
+        anchors = [i * (1.0 / (len(rgba_list) - 1)) for i in range(len(rgba_list) - 1)] + [1.0]
+        xs = [anchor * (N - 1) for anchor in anchors]
+        step = 1.0 / (N - 1)
+        lut = []
+        for i in range(N):
+            if i == 0:
+                lut.append(rgba_list[0])
+                continue
+            if i == N - 1:
+                lut.append(rgba_list[-1])
+                continue
+            x_ind = (i * step) * (N - 1)
+            k = next(index for index, x in enumerate(xs) if x >= x_ind)
+            distance = (x_ind - xs[k - 1]) / (xs[k] - xs[k - 1])
+            lut.append(tuple(min(max(distance * (rgba_list[k][c] - rgba_list[k - 1][c]) + rgba_list[k - 1][c], 0.0), 1.0)
+                             for c in range(4)))
+        return cls(name, lut)
+
+    @property
+    def lut(self):
+        return self.__lut
+
+    def __call__(self, scale: float, bytes: bool = False):
+        if scale != scale:
+            rgba = (0.0, 0.0, 0.0, 0.0)
+        else:
+            x = scale * self.N
+            if x == self.N:
+                x = self.N - 1
+            if x < 0:
+                rgba = self.__lut[0]
+            elif x >= self.N:
+                rgba = self.__lut[-1]
+            else:
+                rgba = self.__lut[int(x)]
+        if bytes:
+            return tuple(int(c * 255) for c in rgba)
+        return rgba
+
 
 class HeatmapRenderer(WorksheetShell):
-    DEFAULT_COLORMAP = LinearSegmentedColormap.from_list("custom", [(0, 1, 0), (1, 1, 0), (1, 0, 0)])
-    __slots__ = '__max', '__min', '__cmap', '__0c', '__0m'
+    DEFAULT_COLORMAP = LinearColormap.from_list("custom", [(0, 1, 0), (1, 1, 0), (1, 0, 0)])
+    __slots__ = '__max', '__min', '__cmap', '__0c', '__0m', '__color_lut'
 
     def __init__(self, worksheet: Worksheet, max_value: int | float, min_value: int | float,
-                 color_map: Colormap = None, zero_color='D0D0D0', zero_mask=0):
+                 color_map: Callable[..., tuple] = None, zero_color='D0D0D0', zero_mask=0):
+        # color_map: LinearColormap 或 matplotlib Colormap 等可调用对象，需支持 color_map(scale, bytes=True) 及属性 N
         super().__init__(worksheet)
         self.__max = max_value
         self.__min = min_value
@@ -457,6 +844,7 @@ class HeatmapRenderer(WorksheetShell):
             self.__cmap = self.DEFAULT_COLORMAP
         self.__0c = zero_color
         self.__0m = zero_mask
+        self.__color_lut = None
 
     def __color_picker(self, scale: float):
         r, g, b, _ = self.__cmap(scale, bytes=True)
@@ -472,9 +860,88 @@ class HeatmapRenderer(WorksheetShell):
             return self.__0m
         return value
 
+    # 颜色查找表：下标 0~N-1 对应颜色映射的 N 个量化颜色，下标 N 对应 nan
+    @property
+    def __lut(self):
+        if self.__color_lut is None:
+            n = self.__cmap.N
+            self.__color_lut = [self.__color_picker((i + 0.5) / n) for i in range(n)] + [self.__color_picker(float('nan'))]
+        return self.__color_lut
+
+    # 整个数组一次性计算颜色（十六进制字符串数组），量化规则与 color_map(scale) 一致
+    def color_array(self, value_array: np.ndarray):
+        import numpy as np
+
+        n = self.__cmap.N
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = (value_array - self.__min) / (self.__max - self.__min)
+            x = scale * n
+        x[x == n] = n - 1
+        index = np.clip(np.nan_to_num(x, nan=0.0, posinf=n - 1, neginf=0.0), 0, n - 1).astype(int)
+        index[np.isnan(x)] = n
+        colors = np.array(self.__lut, dtype=object)[index]
+        if self.__0c:
+            colors[value_array == 0] = self.__0c
+        return colors
+
     def colorful_value(self, row: int, col: int, value: Any, color: str = None):
         self.worksheet.cell(row, col).value = self.__mask_value(value)
         if color is not None:
             CellSetting.setting_fill_color(self.worksheet, row, col, color)
         else:
             CellSetting.setting_fill_color(self.worksheet, row, col, self.__linear_color(value))
+
+    # 以 (row, col) 为左上角写入整个数组并着色；color_mask 为 True 的位置使用 mask_color
+    def colorful_array(self, row: int, col: int, value_array: np.ndarray, color_mask: np.ndarray = None,
+                       mask_color: str = 'D0D0D0'):
+        colors = self.color_array(value_array)
+        if color_mask is not None:
+            colors[color_mask] = mask_color
+        # 每种颜色只构造一个填充对象
+        fills = {color: StyleCache.fill(color) for color in set(colors.ravel().tolist())}
+        ws = self.worksheet
+        for i, (value_row, color_row) in enumerate(zip(value_array.tolist(), colors.tolist())):
+            for j, (value, color) in enumerate(zip(value_row, color_row)):
+                cell = ws.cell(row + i, col + j)
+                cell.value = self.__mask_value(value)
+                cell.fill = fills[color]
+
+    # 条件格式填充（DXF 中纯色填充取 bgColor）
+    @staticmethod
+    def __rule_fill(color: str):
+        return StyleCache.get(PatternFill, patternType='solid', fgColor=color.upper(), bgColor=color.upper())
+
+    # 以 (row, col) 为左上角写入整个数组，不逐格着色，而是附加 Excel 原生条件格式：
+    # color_mask 区域（固定 mask_color）> 零值（zero_color）> 三色刻度（按 color_map 的首、中、尾颜色线性渐变）
+    def color_scale_array(self, row: int, col: int, value_array: np.ndarray, color_mask: np.ndarray = None,
+                          mask_color: str = 'D0D0D0'):
+        ws = self.worksheet
+        for i, value_row in enumerate(value_array.tolist()):
+            for j, value in enumerate(value_row):
+                ws.cell(row + i, col + j).value = self.__mask_value(value)
+        value_scope = RCActivator.scope_int2str(row, col, row + value_array.shape[0] - 1,
+                                                col + value_array.shape[1] - 1)
+        if color_mask is not None and color_mask.any():
+            # 按行合并连续的屏蔽单元格，生成紧凑的区域列表
+            mask_scopes = []
+            for i, mask_row in enumerate(color_mask.tolist()):
+                j = 0
+                while j < len(mask_row):
+                    if not mask_row[j]:
+                        j += 1
+                        continue
+                    start = j
+                    while j < len(mask_row) and mask_row[j]:
+                        j += 1
+                    mask_scopes.append(RCActivator.scope_int2str(row + i, col + start, row + i, col + j - 1))
+            ws.conditional_formatting.add(' '.join(mask_scopes),
+                                          FormulaRule(formula=['TRUE'], fill=self.__rule_fill(mask_color),
+                                                      stopIfTrue=True))
+        if self.__0c:
+            ws.conditional_formatting.add(value_scope,
+                                          CellIsRule(operator='equal', formula=[str(self.__0m)],
+                                                     fill=self.__rule_fill(self.__0c), stopIfTrue=True))
+        ws.conditional_formatting.add(value_scope, ColorScaleRule(
+            start_type='num', start_value=self.__min, start_color=self.__color_picker(0.0).upper(),
+            mid_type='num', mid_value=(self.__min + self.__max) / 2, mid_color=self.__color_picker(0.5).upper(),
+            end_type='num', end_value=self.__max, end_color=self.__color_picker(1.0).upper()))
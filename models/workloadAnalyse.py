@@ -1,16 +1,26 @@
 import pandas as pd
 import numpy as np
+import csv
+import os
+import pickle
+import re
+import tempfile
+import threading
+from datetime import date, datetime
 # import itertools
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from enum import Enum
-from typing import Callable
+from typing import Any, Callable, Iterable, Iterator
 from openpyxl import load_workbook, Workbook
+from openpyxl.worksheet.worksheet import Worksheet
 # from copy import deepcopy
 from .accessAgent import JIRAOperator
 from . import issueData as issueD
 from . import fieldStructure as fieldS
-from .component import ReferenceMap
+from .component import CoordinateCache, ReferenceMap
 from .support import exceptions as exc, utils
-from .support.workbookProcess import WorksheetProcessor
+from .support.workbookProcess import CellSetting, RCActivator, WorksheetShell
 
 
 class Workload:
@@ -48,6 +58,10 @@ class Workload:
     def belong_issue_key(self):
         return self.__issue.key
 
+    @property
+    def author(self):
+        return self.__worklog.created_author
+
     @property
     def person_hour(self):
         return self.__rate * self.__worklog.timeSpentSeconds / 3600
@@ -56,11 +70,18 @@ class Workload:
     def person_day(self):
         return self.person_hour / 8
 
+    # 工作日志的开始时间，默认工作日志以其创建时间（事务解决时间）代替，均无时为 None
+    @property
+    def started(self):
+        timestring = self.__worklog.started_timestring or self.__worklog.created_timestring
+        return utils.parse_jira_time(timestring) if timestring else None
+
     def is_default(self):
         return self.__worklog.id == '-1'
 
-    def get_worklog_info(self):
-        return pd.Series([
+    # 工时明细行，列与 WORKLOG_COLUMNS 中 coordinate 之后的各列一致
+    def worklog_row(self):
+        return [
             self.__issue.info_string,
             self.__task.info_string if self.__task else '# NoTask',
             self.__epic.info_string,
@@ -69,12 +90,25 @@ class Workload:
             self.__worklog.comment,
             self.__worklog.timeSpentSeconds / 3600,
             self.__rate,
-        ])
+        ]
+
+    def get_worklog_info(self):
+        return pd.Series(self.worklog_row())
+
+
+# 工时明细表的列
+WORKLOG_COLUMNS = ['coordinate', 'issue', 'task', 'epic', 'project', 'creator', 'comment', 'time(hour)', 'rate']
+# 工时明细表的排序列
+WORKLOG_SORT_COLUMNS = ['coordinate', 'issue', 'project']
 
 
 class Cell:
-    def __init__(self, r1: str, r2: str, c1: str, c2: str, ref_map: ReferenceMap):
+    # keep_workloads: 为 False 时不保留工时记录对象（及其引用的事务），只保留按事务汇总的统计，用于流式聚合
+    def __init__(self, r1: str, r2: str, c1: str, c2: str, ref_map: ReferenceMap, keep_workloads=True):
         self.__workloads: list[Workload] = []
+        self.__keep_workloads = keep_workloads
+        # 事务 key -> (工时记录数, {开始日期: 人·天}, {人员 key: 人·天})，各项指标均由此汇总
+        self.__issue_stats: dict[str, tuple[list[int], dict[date | None, float], dict[str, float]]] = {}
         self.__r1 = r1
         self.__r2 = r2
         self.__c1 = c1
@@ -85,12 +119,28 @@ class Cell:
         self.__std_time = ReferenceMap.cell2value(located_cell)
         self.__value_index = ReferenceMap.cell2index(located_cell)
 
-    def add_workload(self, issue: issueD.Issue, jira_op: JIRAOperator, rate: float):
+    def __record(self, workload: Workload):
+        count, by_day, by_author = self.__issue_stats.setdefault(workload.belong_issue_key, ([0], {}, {}))
+        count[0] += 1
+        started = workload.started
+        day = started.date() if started is not None else None
+        by_day[day] = by_day.get(day, 0) + workload.person_day
+        author_key = workload.author.key
+        by_author[author_key] = by_author.get(author_key, 0) + workload.person_day
+        if self.__keep_workloads:
+            self.__workloads.append(workload)
+
+    # window: 规范化的报表时间窗口 [start, end)，只计入开始时间在窗口内的工作日志
+    # 没有工作日志的事务按标准工时计入默认工作日志，设置窗口时仅当解决时间在窗口内才计入
+    # 返回本次加入的工时记录
+    def add_workload(self, issue: issueD.Issue, jira_op: JIRAOperator, rate: float,
+                     window: tuple[datetime | None, datetime | None] = (None, None)):
+        added = []
         if issue.worklogs:
-            for worklog in issue.worklogs:
+            for worklog in issue.worklogs_between(*window):
                 assert worklog.issueId == issue.id
-                self.__workloads.append(Workload(worklog, jira_op, rate))
-        else:
+                added.append(Workload(worklog, jira_op, rate))
+        elif Matrix.in_window(issue.resolution_timestring, window):
             default_worklog = fieldS.Worklog(
                 id='-1',
                 created_author=issue.assignee if issue.assignee is not None else issue.creator,
@@ -103,7 +153,19 @@ class Cell:
                 updated_author=fieldS.User.init_default(),
                 updated_timestring='',
             )
-            self.__workloads.append(Workload(default_worklog, jira_op, rate))
+            added.append(Workload(default_worklog, jira_op, rate))
+        for workload in added:
+            self.__record(workload)
+        return added
+
+    # 移除某事务的全部工时，返回该事务按人员汇总的工时 {人员 key: 人·天}
+    def remove_issue(self, issue_key: str):
+        stats = self.__issue_stats.pop(issue_key, None)
+        if stats is None:
+            return {}
+        if self.__keep_workloads:
+            self.__workloads = [workload for workload in self.__workloads if workload.belong_issue_key != issue_key]
+        return stats[2]
 
     @property
     def coord_string(self):
@@ -119,20 +181,17 @@ class Cell:
 
     @property
     def num_worklog(self):
-        return len(self.__workloads)
+        return sum(count[0] for count, _, _ in self.__issue_stats.values())
 
     @property
     def num_issues(self):
-        return len(set(map(lambda x: x.belong_issue_key, self.__workloads)))
+        return len(self.__issue_stats)
 
     def cumulative_workload(self, unit='day'):
-        if unit == 'day':
-            return sum(map(lambda x: x.person_day, self.__workloads))
-        elif unit == 'hour':
-            return sum(map(lambda x: x.person_hour, self.__workloads))
-        else:
+        if unit not in ('day', 'hour'):
             raise ValueError("Unknown unit: %s." % unit)
-
+        person_day = sum(sum(by_day.values()) for _, by_day, _ in self.__issue_stats.values())
+        return person_day if unit == 'day' else person_day * 8
 
     def standard_workload(self, unit='day'):
         if unit == 'day':
@@ -142,6 +201,38 @@ class Cell:
         else:
             raise ValueError("Unknown unit: %s." % unit)
 
+    # 一次遍历按事务汇总的统计得到全部指标，顺序与 Matrix.METRICS 一致：
+    # 事务数，工时记录数，累计工时，标准工时（单事务标准工时 × 事务数），偏差率（累计/标准 - 1）
+    def metrics(self, unit='day'):
+        if unit not in ('day', 'hour'):
+            raise ValueError("Unknown unit: %s." % unit)
+        num_worklog = 0
+        cumulative = 0
+        for count, by_day, _ in self.__issue_stats.values():
+            num_worklog += count[0]
+            cumulative += sum(by_day.values())
+        if unit == 'hour':
+            cumulative *= 8
+        standard = self.standard_workload(unit) * len(self.__issue_stats)
+        deviation = cumulative / standard - 1 if standard else 0
+        return len(self.__issue_stats), num_worklog, cumulative, standard, deviation
+
+    # 按时间区间汇总工时：{区间起点: 工时}，没有开始时间的工时记录（未解决事务的默认工作日志）计入 None
+    def bucketed_workload(self, bucket='month', unit='day'):
+        if unit not in ('day', 'hour'):
+            raise ValueError("Unknown unit: %s." % unit)
+        factor = 1 if unit == 'day' else 8
+        buckets: dict[date | None, float] = {}
+        for _, by_day, _ in self.__issue_stats.values():
+            for day, person_day in by_day.items():
+                key = None if day is None else utils.time_bucket(datetime(day.year, day.month, day.day), bucket)
+                buckets[key] = buckets.get(key, 0) + person_day * factor
+        return buckets
+
+    @property
+    def ref_map_name(self):
+        return self.__ref_map.worksheet_name
+
     def refer_from(self, ref_map: ReferenceMap):
         if ref_map is self.__ref_map or ref_map.worksheet_name == self.__ref_map.worksheet_name:
             return True
@@ -149,6 +240,8 @@ class Cell:
             return False
 
     def get_worklog_table(self):
+        if not self.__keep_workloads:
+            raise ValueError("The workloads of cell %s are not kept." % self.coord_string)
         concat_list = []
         for workload in self.__workloads:
             concat_list.append(workload.get_worklog_info())
@@ -156,12 +249,24 @@ class Cell:
         table = utils.concat_single_value(table,
                                           left=[self.coord_string],
                                           repeat=True,
-                                          columns=['coordinate', 'issue', 'task', 'epic', 'project',
-                                                   'creator', 'comment', 'time(hour)', 'rate'])
+                                          columns=WORKLOG_COLUMNS)
         return table
 
 
 class Matrix:
+    # 指标矩阵堆叠（build_metric_stack）第一维各层的含义
+    METRICS = ('issues', 'worklogs', 'cumulative', 'standard', 'deviation')
+
+    @staticmethod
+    def in_window(timestring: str | None, window: tuple[datetime | None, datetime | None]):
+        start, end = window
+        if start is None and end is None:
+            return True
+        if not timestring:
+            return False
+        moment = utils.parse_jira_time(timestring)
+        return (start is None or start <= moment) and (end is None or moment < end)
+
     class LoadResult(Enum):
         SKIP = 1, 'Skip'
         SUCCESS = 0, 'Success'
@@ -172,21 +277,45 @@ class Matrix:
             self.res_name = result_name
 
     class __MetaData:
-        def __init__(self, issue: issueD.Issue | issueD.TaskLike):
+        def __init__(self, issue: issueD.Issue | issueD.TaskLike,
+                     window: tuple[datetime | None, datetime | None] = (None, None)):
             self.__issue = issue
+            self.key = issue.key
+            self.parent_key = issue.parent_key if isinstance(issue, issueD.TaskLike) else None
+            # 精简后保留的报表字段
+            self.__report_fields = None
             self.__load_result = None
             self.__load_detail = None
             self.ref_class = type(issue)
             self.std_time = -1
-            if issue.worklogs:
-                self.worklog = (sum(map(lambda x:x.timeSpentSeconds, issue.worklogs)))/3600/8
+            # 窗口内没有工作日志时同样标记为 -1
+            worklogs = issue.worklogs_between(*window) if issue.worklogs else []
+            if worklogs:
+                self.worklog = sum(map(lambda x: x.timeSpentSeconds, worklogs)) / 3600 / 8
             else:
                 self.worklog = -1
+            self.__window_worklog = self.worklog
 
+        # 精简后为 None
         @property
         def issue(self):
             return self.__issue
 
+        # 加载报告所需的事务字段：key、类型、概要、创建人、经办人、描述字符串
+        @property
+        def report_fields(self):
+            if self.__issue is None:
+                return self.__report_fields
+            issue = self.__issue
+            return (issue.key, issue.issueType.name, issue.summary, issue.creator.displayName,
+                    issue.assignee.displayName if issue.assignee is not None else '未指定', issue.info_string)
+
+        # 只保留报表字段，释放事务对象
+        def compact(self):
+            if self.__issue is not None:
+                self.__report_fields = self.report_fields
+                self.__issue = None
+
         @property
         def load_result(self):
             return self.__load_result
@@ -207,37 +336,138 @@ class Matrix:
             self.__load_result = Matrix.LoadResult.WRONG
             self.__load_detail = detail
 
-    def __init__(self, issues: issueD.IssueList, jira_op: JIRAOperator, ref_filename: str):
-        jira_op.add_cache(issues)
+        # 撤回加载结果：标准工时及结算工时恢复为加载前的值
+        def reset(self):
+            self.std_time = -1
+            self.worklog = self.__window_worklog
+
+        def dump_state(self):
+            return (self.__issue, self.key, self.parent_key, self.__report_fields, self.__load_result,
+                    self.__load_detail, self.ref_class, self.std_time, self.worklog, self.__window_worklog)
+
+        @classmethod
+        def restore(cls, state: tuple):
+            metadata = cls.__new__(cls)
+            (metadata.__issue, metadata.key, metadata.parent_key, metadata.__report_fields, metadata.__load_result,
+             metadata.__load_detail, metadata.ref_class, metadata.std_time, metadata.worklog,
+             metadata.__window_worklog) = state
+            return metadata
+
+    def __init__(self, issues: issueD.IssueList, jira_op: JIRAOperator, ref_filename: str, max_workers: int = None,
+                 window_start: date | datetime = None, window_end: date | datetime = None,
+                 streaming=False, worklog_sink: str = None):
+        # max_workers: 大于 1 时使用线程池并行获取事务链（父任务及 Epic）并生成坐标，结果与串行模式一致；
+        #   Cell 匹配及 add_workload 仍串行执行，主要节省获取父事务的网络等待，本地计算部分没有加速
+        # window_start, window_end: 报表时间窗口，只统计窗口内的工作日志（配合 JQL.worklog_window 缩小搜索范围）
+        #   window_end 为 date 时包含当天，为 datetime 时不包含该时刻
+        # streaming: 流式模式，Cell 不保留工时记录对象，每次 consume 后精简元数据并移出 JIRAOperator 缓存，
+        #   工时明细逐行写入 worklog_sink（CSV 文件，为空时使用临时文件），内存中只保留汇总结果及加载报告
+        self.__streaming = streaming
+        self.__worklog_sink = worklog_sink
+        if streaming and worklog_sink is None:
+            fd, self.__worklog_sink = tempfile.mkstemp(prefix='worklog_', suffix='.csv')
+            os.close(fd)
+        if streaming:
+            open(self.__worklog_sink, 'w', encoding='utf-8').close()
+        self.__sink_file = None
+        self.__sink_writer = None
+        # 已撤回的事务 key，读取工时明细时跳过
+        self.__withdrawn_keys: set[str] = set()
+        self.__window = utils.normalize_window(window_start, window_end)
         self.__jira_op = jira_op
-        ref_xlsx = load_workbook(ref_filename)
-        self.__ref_test = ReferenceMap(ref_xlsx.worksheets[0], (2, 3))
-        self.__ref_manage = ReferenceMap(ref_xlsx.worksheets[1], (2, 3))
+        self.__max_workers = max_workers
+        self.__ref_filename = ref_filename
+        self.__ref_test = ReferenceMap.from_file(ref_filename, 0, (2, 3))
+        self.__ref_manage = ReferenceMap.from_file(ref_filename, 1, (2, 3))
         self.__meta_datas: list[Matrix.__MetaData] = []
         self.__cells: list[Cell] = []
+        # 坐标 -> Cell 索引
+        self.__cell_index: dict[tuple, Cell] = {}
+        self.__cells_lock = threading.Lock()
+        # (参考表名, 单位) -> 指标矩阵堆叠
+        self.__metric_stacks: dict[tuple[str, str], np.ndarray] = {}
+        # 按人员的稀疏工时（字典键存储）：(人员 key, 参考表名, 行, 列) -> 工时（人·天），在加载时累加
+        self.__person_workloads: dict[tuple[str, str, int, int], float] = {}
+        # 人员 key -> 人员
+        self.__persons: dict[str, fieldS.User] = {}
+        # (参考表名, 时间区间, 单位) -> (区间起点列表, 时间立方)
+        self.__time_cubes: dict[tuple[str, str, str], tuple[list[date], np.ndarray]] = {}
+        # 事务 key -> 元数据
+        self.__metadata_index: dict[str, Matrix.__MetaData] = {}
+        # 上级事务 key -> 下级类任务型事务 key 集合
+        self.__children: dict[str, set[str]] = {}
+        # 坐标签名 -> 坐标解析结果（[(Cell, 分摊比例)], 失败原因）
+        self.__resolutions: dict[tuple, tuple[list[tuple[Cell, float]], str | None]] = {}
+        # 事务 key -> 计入了该事务工时的 Cell，用于增量更新时撤回
+        self.__contributions: dict[str, list[Cell]] = {}
+        self.consume(issues, max_workers)
+
+    # 分块流式构建：逐块加载事务，内存中只保留汇总结果，参见 IssueList.iter_issue_pages
+    @classmethod
+    def streaming(cls, issue_chunks: Iterable[list[issueD.Issue]], jira_op: JIRAOperator, ref_filename: str,
+                  worklog_sink: str = None, max_workers: int = None,
+                  window_start: date | datetime = None, window_end: date | datetime = None):
+        matrix = cls([], jira_op, ref_filename, max_workers, window_start, window_end,
+                     streaming=True, worklog_sink=worklog_sink)
+        for issues in issue_chunks:
+            matrix.consume(issues, max_workers)
+        matrix.close_sink()
+        return matrix
+
+    @property
+    def worklog_sink(self):
+        return self.__worklog_sink
+
+    # 加载一批事务；流式模式下加载完成后精简元数据，并将非 Epic 事务移出 JIRAOperator 缓存
+    # （Epic 数量少且被大量事务引用，保留在缓存中；后续块需要的其他上级事务按需重新获取）
+    def consume(self, issues: Iterable[issueD.Issue], max_workers: int = None):
+        issues = list(issues)
+        self.__jira_op.add_cache(issues)
+        new_metadatas = []
         for issue in issues:
-            self.__meta_datas.append(self.__MetaData(issue))
-        for metadata in self.__meta_datas:
-            issue = metadata.issue
-            if type(issue) is issueD.Subtask:
-                try:
-                    p1, p2 = jira_op.find_parents(issue)
-                except exc.GetIssueFailedError as e:
-                    metadata.wrong("%s(TaskLike.parent_key=%s)." % (e, metadata.issue.parent_key))
-                    continue
-                if p1 is None:
-                    metadata.wrong('该子任务的父任务为 Epic！！！')
+            metadata = self.__MetaData(issue, self.__window)
+            new_metadatas.append(metadata)
+            self.__meta_datas.append(metadata)
+            self.__metadata_index.setdefault(issue.key, metadata)
+        self.__classify(new_metadatas)
+        self.load_workload_into_cell(max_workers)
+        if self.__streaming:
+            for metadata in new_metadatas:
+                metadata.compact()
+            self.__jira_op.remove_cache([issue.key for issue in issues if type(issue) is not issueD.Epic])
+            if self.__sink_file is not None:
+                self.__sink_file.flush()
+        return self
+
+    def __sink_rows(self, issue_key: str, cell: Cell, workloads: list[Workload]):
+        if self.__sink_writer is None:
+            self.__sink_file = open(self.__worklog_sink, 'a', encoding='utf-8', newline='')
+            self.__sink_writer = csv.writer(self.__sink_file)
+        for workload in workloads:
+            self.__sink_writer.writerow([issue_key, cell.coord_string, *workload.worklog_row()])
+
+    def close_sink(self):
+        if self.__sink_file is not None:
+            self.__sink_file.close()
+            self.__sink_file = None
+            self.__sink_writer = None
+
+    # 逐行读取流式模式写出的工时明细，列与 WORKLOG_COLUMNS 一致，已撤回事务的明细跳过
+    # sort: 按 WORKLOG_SORT_COLUMNS 排序（与 export_worklog_table 一致），需要将明细读入内存；否则按写入顺序逐行产出
+    def iter_worklog_rows(self, sort=False) -> Iterator[list]:
+        if not self.__streaming:
+            raise ValueError("Worklog rows are only written to the sink in streaming mode.")
+        if sort:
+            indexes = [WORKLOG_COLUMNS.index(column) for column in WORKLOG_SORT_COLUMNS]
+            yield from sorted(self.iter_worklog_rows(), key=lambda x: [x[i] for i in indexes])
+            return
+        if self.__sink_file is not None:
+            self.__sink_file.flush()
+        with open(self.__worklog_sink, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.reader(f):
+                if row[0] in self.__withdrawn_keys:
                     continue
-            # 非类任务型
-            if not issubclass(type(issue), issueD.TaskLike):
-                metadata.skip("Is not subclass of TaskLike: %s." % issue.issueType.name)
-                continue
-            index = issues.self_search_by(issue.parent_key, return_index=True)
-            # 排除存在子任务的父任务
-            if index is not None:
-                md_p = self.__meta_datas[index]
-                md_p.skip("This issue is parent of: %s." % metadata.issue.key)
-        self.load_workload_into_cell()
+                yield [*row[1:-2], float(row[-2]), float(row[-1])]
 
     # @staticmethod
     # def __coordinate_grouping(coord: tuple):
@@ -284,6 +514,158 @@ class Matrix:
     #         coord_gens.append(self.__coordinate_generator(group))
     #     return coord_gens
 
+    # 排除不需要加载的事务：父任务为 Epic 的子任务、非类任务型事务、存在子任务的父任务
+    # 存在下级事务的事务（包括此前已加载的事务）撤回工时并排除，说明取 key 最大的下级事务，结果与加载顺序无关
+    def __classify(self, metadatas: list[__MetaData]):
+        subtask_metadatas = [metadata for metadata in metadatas if type(metadata.issue) is issueD.Subtask]
+        parents_resolvers = {id(metadata): resolve for resolve, metadata in zip(
+            self.__resolving(lambda x: self.__jira_op.find_parents(x.issue), subtask_metadatas), subtask_metadatas)}
+        parent_keys = set()
+        for metadata in metadatas:
+            issue = metadata.issue
+            if type(issue) is issueD.Subtask:
+                try:
+                    p1, p2 = parents_resolvers[id(metadata)]()
+                except exc.GetIssueFailedError as e:
+                    metadata.wrong("%s(TaskLike.parent_key=%s)." % (e, metadata.issue.parent_key))
+                    continue
+                if p1 is None:
+                    metadata.wrong('该子任务的父任务为 Epic！！！')
+                    continue
+            # 非类任务型
+            if not issubclass(type(issue), issueD.TaskLike):
+                metadata.skip("Is not subclass of TaskLike: %s." % issue.issueType.name)
+                continue
+            self.__children.setdefault(issue.parent_key, set()).add(issue.key)
+            parent_keys.add(issue.parent_key)
+        # 排除存在子任务的父任务；增量更新或流式加载时，已有下级事务的事务同样排除
+        for key in parent_keys | {metadata.key for metadata in metadatas}:
+            md_p = self.__metadata_index.get(key)
+            children = self.__children.get(key)
+            if md_p is None or not children:
+                continue
+            self.__withdraw(key)
+            md_p.reset()
+            md_p.skip("This issue is parent of: %s." % max(children))
+
+    # 撤回某事务计入各 Cell 及人员汇总的工时
+    def __withdraw(self, issue_key: str):
+        cells = self.__contributions.pop(issue_key, [])
+        if cells and self.__streaming:
+            self.__withdrawn_keys.add(issue_key)
+        for cell in cells:
+            for author_key, person_day in cell.remove_issue(issue_key).items():
+                key = (author_key, cell.ref_map_name, *cell.coord_index)
+                remaining = self.__person_workloads.get(key, 0) - person_day
+                if remaining > 1e-9:
+                    self.__person_workloads[key] = remaining
+                else:
+                    self.__person_workloads.pop(key, None)
+
+    def __descendants(self, keys: set[str]):
+        found = set()
+        stack = list(keys)
+        while stack:
+            for child_key in self.__children.get(stack.pop(), ()):
+                if child_key not in found:
+                    found.add(child_key)
+                    stack.append(child_key)
+        return found
+
+    # 增量更新：撤回变化及删除事务的原有工时，重新解析变化事务的坐标及工时并计入
+    # 受影响的上级事务（是否存在子任务可能改变）及下级事务（坐标依赖上级事务）一并重新加载
+    def apply_delta(self, changed_issues: list[issueD.Issue], removed_keys: Iterable[str] = (),
+                    max_workers: int = None):
+        if self.__streaming:
+            raise ValueError("Incremental update is not supported in streaming mode, the issues have been released.")
+        changed_issues = list(changed_issues)
+        removed_keys = set(removed_keys)
+        changed_keys = {issue.key for issue in changed_issues}
+        print("Applying delta: %d changed, %d removed ..." % (len(changed_keys), len(removed_keys)))
+        parent_keys = set()
+        for key in changed_keys | removed_keys:
+            old = self.__metadata_index.get(key)
+            if old is not None and old.parent_key is not None:
+                parent_keys.add(old.parent_key)
+        for issue in changed_issues:
+            if isinstance(issue, issueD.TaskLike):
+                parent_keys.add(issue.parent_key)
+        reload_keys = ((parent_keys | self.__descendants(changed_keys | removed_keys))
+                       & self.__metadata_index.keys()) - changed_keys - removed_keys
+        drop_keys = changed_keys | removed_keys | reload_keys
+        # 撤回原有工时并移除原有元数据
+        for key in drop_keys:
+            old = self.__metadata_index.pop(key, None)
+            if old is None:
+                continue
+            self.__withdraw(key)
+            if old.parent_key is not None:
+                self.__children.get(old.parent_key, set()).discard(key)
+        self.__jira_op.remove_cache(removed_keys)
+        self.__jira_op.refresh_cache(changed_issues)
+        # 重新加载及变化的事务保持原有位置，新增事务追加在最后，加载报告及加载顺序与全量重建一致
+        changed_by_key = {issue.key: issue for issue in changed_issues}
+        meta_datas = []
+        new_metadatas = []
+        for metadata in self.__meta_datas:
+            if metadata.key not in drop_keys:
+                meta_datas.append(metadata)
+                continue
+            if metadata.key in removed_keys:
+                continue
+            issue = changed_by_key.pop(metadata.key, metadata.issue)
+            new_metadatas.append(self.__MetaData(issue, self.__window))
+            meta_datas.append(new_metadatas[-1])
+        for issue in changed_by_key.values():
+            new_metadatas.append(self.__MetaData(issue, self.__window))
+            meta_datas.append(new_metadatas[-1])
+        self.__meta_datas = meta_datas
+        for metadata in new_metadatas:
+            self.__metadata_index.setdefault(metadata.key, metadata)
+        self.__classify(new_metadatas)
+        self.load_workload_into_cell(max_workers)
+        return self
+
+    def __getstate__(self):
+        # JIRAOperator、锁及可重建的索引与缓存不参与序列化
+        state = self.__dict__.copy()
+        for name in ['jira_op', 'cells_lock', 'cell_index', 'metadata_index', 'metric_stacks', 'time_cubes',
+                     'resolutions', 'sink_file', 'sink_writer']:
+            state.pop('_Matrix__' + name)
+        state['_Matrix__meta_datas'] = [metadata.dump_state() for metadata in self.__meta_datas]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self.__meta_datas = [self.__MetaData.restore(metadata_state) for metadata_state in self.__meta_datas]
+        self.__metadata_index = {}
+        for metadata in self.__meta_datas:
+            self.__metadata_index.setdefault(metadata.key, metadata)
+        self.__cell_index = {cell.coord_tuple: cell for cell in self.__cells}
+        self.__cells_lock = threading.Lock()
+        self.__metric_stacks = {}
+        self.__time_cubes = {}
+        self.__resolutions = {}
+        self.__sink_file = None
+        self.__sink_writer = None
+        self.__jira_op = None
+
+    # 保存聚合状态，下次运行可由 load_state 恢复后调用 apply_delta 增量更新
+    def save_state(self, filename: str):
+        with open(filename + '.tmp', 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(filename + '.tmp', filename)
+
+    @classmethod
+    def load_state(cls, filename: str, jira_op: JIRAOperator, max_workers: int = None):
+        with open(filename, 'rb') as f:
+            matrix: Matrix = pickle.load(f)
+        matrix.__jira_op = jira_op
+        if max_workers is not None:
+            matrix.__max_workers = max_workers
+        jira_op.add_cache([metadata.issue for metadata in matrix.__meta_datas if metadata.issue is not None])
+        return matrix
+
     def __analyse_coordinate(self, metadata: __MetaData):
         task_like = metadata.issue
         # 构造事务链
@@ -291,18 +673,33 @@ class Matrix:
         # 子任务继承上级事务类型
         if type(task_like) is issueD.Subtask and issubclass(type(task), issueD.TaskLike):
             metadata.ref_class = type(task)
-        # 生成坐标集合（分组）
+        # 事务链校验及坐标生成只依赖本事务，逐个事务执行，不经过缓存
         coord_cache = task_like.generate_coordinate(epic, task=task)
-        return coord_cache
+        return coord_cache, task_like.coordinate_signature(epic, task=task)
 
-    def load_workload_into_cell(self):
+    def __resolving(self, func: Callable, items: list, max_workers: int = None) -> Iterator[Callable[[], ...]]:
+        # 按 items 顺序产出结果获取函数，调用时返回 func(item) 的结果或抛出其异常
+        if max_workers is None:
+            max_workers = self.__max_workers
+        if max_workers is None or max_workers <= 1:
+            for item in items:
+                yield lambda x=item: func(x)
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(func, item) for item in items]
+            for future in futures:
+                yield future.result
+
+    def load_workload_into_cell(self, max_workers: int = None):
         print("Loading workload into cell ...")
-        for metadata in self.__meta_datas:
-            if metadata.load_result is not None:
-                continue
+        self.__metric_stacks.clear()
+        self.__time_cubes.clear()
+        pending = [metadata for metadata in self.__meta_datas if metadata.load_result is None]
+        # 并行模式下事务链的获取及坐标生成在线程池中执行；Cell 匹配、创建及工时加载会修改共享状态，仍按原顺序串行执行
+        chain_resolvers = self.__resolving(self.__analyse_coordinate, pending, max_workers)
+        for resolve_chain, metadata in zip(chain_resolvers, pending):
             try:
-                # coord_gens = self.__analyse_coordinate(metadata)
-                coord_cache = self.__analyse_coordinate(metadata)
+                coord_cache, signature = resolve_chain()
             # 构造事务链失败
             except exc.GetIssueFailedError as e:
                 metadata.wrong("%s(TaskLike.parent_key=%s)." % (e, metadata.issue.parent_key))
@@ -311,85 +708,101 @@ class Matrix:
             except exc.CoordinateError as e:
                 metadata.wrong(str(e))
                 continue
-            # cell_list = []
-            # wrong_flag = False
-            # for coord_generator in coord_gens:
-            #     try:
-            #         for coord in coord_generator:
-            #             cell = self.__find_cell_or_create(coord, metadata.ref_class)
-            #             cell_list.append(cell)
-            #         break
-            #     # 匹配坐标（集合）失败
-            #     except exc.MisMatchingError as e:
-            #         if coord_generator is coord_gens[-1]:
-            #             metadata.wrong(str(e))
-            #             wrong_flag = True
-            #             break
-            #         else:
-            #             continue
-            # # 分组的所有坐标（集合）都匹配失败
-            # if wrong_flag:
-            #     continue
-            cell_list = []
-            load_results = dict()
-            for coord_set in coord_cache.grouping():
-                try:
-                    for coord in coord_set.generator:
-                        cell = self.__find_cell_or_create((*coord[0], *coord[1]), metadata.ref_class)
-                        cell_list.append(cell)
-                # 匹配坐标集失败
-                except exc.MisMatchingError as e:
-                    cell_list = []
-                    load_results[coord_set.cs_label] = str(e)
-                    continue
-                # 任意一组坐标集匹配成功
-                else:
-                    break
-            # 所有坐标集都匹配失败
-            if not cell_list:
-                metadata.wrong(str(load_results))
+            # 签名相同的事务匹配出相同的 Cell 及分摊比例（或相同的失败原因），只匹配一次
+            resolution = self.__resolutions.get(signature)
+            if resolution is None:
+                resolution = self.__resolve_cells(coord_cache, metadata.ref_class)
+                self.__resolutions[signature] = resolution
+            cell_rates, wrong_detail = resolution
+            if wrong_detail is not None:
+                metadata.wrong(wrong_detail)
                 continue
-            for cell in cell_list:
-                cell.add_workload(metadata.issue, self.__jira_op,
-                                  cell.standard_workload() / sum(map(lambda x: x.standard_workload(), cell_list)))
+            for cell, rate in cell_rates:
+                workloads = cell.add_workload(metadata.issue, self.__jira_op, rate, self.__window)
+                self.__accumulate_person_workloads(cell, workloads)
+                if self.__streaming:
+                    self.__sink_rows(metadata.key, cell, workloads)
+            cell_list = [cell for cell, _ in cell_rates]
+            self.__contributions[metadata.key] = cell_list
             metadata.success("Coordinate(s): " + ' & '.join([cell.coord_string for cell in cell_list]))
             metadata.std_time = sum(map(lambda x: x.standard_workload(), cell_list))
-            if metadata.worklog == -1:
+            # 计入了默认工作日志时，结算工时为标准工时；窗口内没有工作日志的保持 -1
+            if metadata.worklog == -1 and not metadata.issue.worklogs \
+                    and self.in_window(metadata.issue.resolution_timestring, self.__window):
                 metadata.worklog = sum(map(lambda x: x.standard_workload(), cell_list))
         assert len(self.__meta_datas) == sum(self.__num_of(res) for res in self.LoadResult)
         print("Loading issue completed.\n")
 
-    def __find_cell_or_create(self, ref_coord: tuple, ref_class: type):
-        flag = True
-        for cell in self.__cells:
-            coord = cell.coord_tuple
-            for i in range(len(coord)):
-                if coord[i] != ref_coord[i]:
-                    flag = False
-                    break
-            if flag:
-                return cell
-            flag = True
-        # 已有的 Cell 没有坐标能对应上，新建 Cell
+    # 按坐标匹配 Cell，返回 ([(Cell, 分摊比例)], None) 或 ([], 失败原因)
+    def __resolve_cells(self, coord_cache: CoordinateCache, ref_class: type):
+        ref_map = self.__ref_map_of(ref_class)
+        if ref_map is not None:
+            row_check = partial(ref_map.match_coord_prefix, axis=1)
+            col_check = partial(ref_map.match_coord_prefix, axis=0)
+        else:
+            row_check = col_check = None
+        cell_list = []
+        load_results = dict()
+        for coord_set in coord_cache.grouping():
+            try:
+                # 逐层剪枝展开，无法匹配的坐标集在构建完整坐标前即失败
+                for coord in coord_set.pruned_generator(row_check, col_check):
+                    cell = self.__find_cell_or_create((*coord[0], *coord[1]), ref_class)
+                    cell_list.append(cell)
+            # 匹配坐标集失败
+            except exc.MisMatchingError as e:
+                cell_list = []
+                load_results[coord_set.cs_label] = str(e)
+                continue
+            # 任意一组坐标集匹配成功
+            else:
+                break
+        # 所有坐标集都匹配失败
+        if not cell_list:
+            return [], str(load_results)
+        std_sum = sum(map(lambda x: x.standard_workload(), cell_list))
+        return [(cell, cell.standard_workload() / std_sum) for cell in cell_list], None
+
+    def __accumulate_person_workloads(self, cell: Cell, workloads: list[Workload]):
+        sheet_name = cell.ref_map_name
+        row_index, col_index = cell.coord_index
+        for workload in workloads:
+            author = workload.author
+            self.__persons.setdefault(author.key, author)
+            key = (author.key, sheet_name, row_index, col_index)
+            self.__person_workloads[key] = self.__person_workloads.get(key, 0) + workload.person_day
+
+    def __ref_map_of(self, ref_class: type):
         if ref_class is issueD.TestTask:
-            ref_map = self.__ref_test
+            return self.__ref_test
         elif ref_class is issueD.ManageTask:
-            ref_map = self.__ref_manage
+            return self.__ref_manage
         else:
-            ref_map = None
-        new_cell = Cell(*ref_coord, ref_map=ref_map)
-        self.__cells.append(new_cell)
-        return new_cell
+            return None
+
+    def __find_cell_or_create(self, ref_coord: tuple, ref_class: type):
+        with self.__cells_lock:
+            cell = self.__cell_index.get(tuple(ref_coord))
+            if cell is not None:
+                return cell
+            # 已有的 Cell 没有坐标能对应上，新建 Cell
+            new_cell = Cell(*ref_coord, ref_map=self.__ref_map_of(ref_class), keep_workloads=not self.__streaming)
+            self.__cells.append(new_cell)
+            self.__cell_index[new_cell.coord_tuple] = new_cell
+            return new_cell
 
     def export_worklog_table(self):
         print("Exporting worklog table ...")
-        concat_list = []
-        for cell in self.__cells:
-            if cell.num_worklog == 0:
-                continue
-            concat_list.append(cell.get_worklog_table())
-        table = pd.concat(concat_list).reset_index(drop=True)
-        table.sort_values(by=list(table.columns[[0, 1, 4]]), inplace=True)
+        if self.__streaming:
+            table = pd.DataFrame(list(self.iter_worklog_rows()), columns=WORKLOG_COLUMNS)
+        else:
+            concat_list = []
+            for cell in self.__cells:
+                if cell.num_worklog == 0:
+                    continue
+                concat_list.append(cell.get_worklog_table())
+            table = pd.concat(concat_list).reset_index(drop=True)
+        table.sort_values(by=WORKLOG_SORT_COLUMNS, inplace=True)
         print("Exporting worklog table completed.\n")
         return table
 
@@ -407,18 +820,15 @@ class Matrix:
                 print("\t%s(%s): " % (res.res_name, self.__num_of(res)))
                 for metadata in self.__meta_datas:
                     if metadata.load_result is res:
+                        *fields, info_string = metadata.report_fields
                         report_list.append([
-                            metadata.issue.key,
-                            metadata.issue.issueType.name,
-                            metadata.issue.summary,
-                            metadata.issue.creator.displayName,
-                            metadata.issue.assignee.displayName if metadata.issue.assignee is not None else '未指定',
+                            *fields,
                             str(metadata.load_result),
                             metadata.load_detail,
                             metadata.std_time,
                             metadata.worklog,
                         ])
-                        print(utils.specific_length_string(metadata.issue.info_string), metadata.load_detail)
+                        print(utils.specific_length_string(info_string), metadata.load_detail)
         print('Total: %d' % len(self.__meta_datas), end=', ')
         print(', '.join(map(lambda x: '%s: %d' % (x.res_name, self.__num_of(x)), self.LoadResult)) + '\n')
         return pd.DataFrame(report_list, columns=[
@@ -433,73 +843,214 @@ class Matrix:
             '结算工时（人·天），如无有效值则为-1',
         ])
 
-    def __build_matrix(self, ref_map: ReferenceMap, cell_property: Callable[[Cell], int | float]):
+    # 一次遍历所有 Cell 构建参考表对应的全部指标矩阵，返回形状为 (len(METRICS), *ref_map.value_shape) 的数组
+    # 结果按参考表及单位缓存，新增指标表时直接取用对应层，不再重新遍历
+    def build_metric_stack(self, ref_map: ReferenceMap, unit='day'):
+        key = (ref_map.worksheet_name, unit)
+        if key not in self.__metric_stacks:
+            stack = np.zeros((len(self.METRICS), *ref_map.value_shape))
+            for cell in self.__cells:
+                if not cell.refer_from(ref_map):
+                    continue
+                row_index, col_index = cell.coord_index
+                stack[:, row_index, col_index] = cell.metrics(unit)
+            self.__metric_stacks[key] = stack
+        return self.__metric_stacks[key]
+
+    def metric_array(self, ref_map: ReferenceMap, metric: str, unit='day'):
+        return self.build_metric_stack(ref_map, unit)[self.METRICS.index(metric)]
+
+    # 一次遍历所有工时记录构建 (时间区间, 参考表行, 参考表列) 的累计工时立方，返回 (区间起点列表, 立方数组)
+    # bucket: month/week/day，区间按时间顺序排列，没有日期的工时记录在最后的 None 区间，结果按参考表、区间及单位缓存
+    def build_time_cube(self, ref_map: ReferenceMap, bucket='month', unit='day'):
+        key = (ref_map.worksheet_name, bucket, unit)
+        if key not in self.__time_cubes:
+            entries = []
+            for cell in self.__cells:
+                if not cell.refer_from(ref_map):
+                    continue
+                row_index, col_index = cell.coord_index
+                for bucket_start, workload in cell.bucketed_workload(bucket, unit).items():
+                    entries.append((bucket_start, row_index, col_index, workload))
+            bucket_starts = {entry[0] for entry in entries}
+            buckets = sorted(bucket_starts - {None}) + ([None] if None in bucket_starts else [])
+            cube = np.zeros((len(buckets), *ref_map.value_shape))
+            if entries:
+                bucket_index = {bucket_start: i for i, bucket_start in enumerate(buckets)}
+                bucket_starts, rows, cols, workloads = zip(*entries)
+                np.add.at(cube, ([bucket_index[x] for x in bucket_starts], rows, cols), workloads)
+            self.__time_cubes[key] = buckets, cube
+        return self.__time_cubes[key]
+
+    # 人员的稀疏工时记录：[(人员 key, 参考表名, 行, 列, 工时)]，单位 day/hour
+    def person_workload_entries(self, person_key: str = None, unit='day'):
+        if unit not in ('day', 'hour'):
+            raise ValueError("Unknown unit: %s." % unit)
+        factor = 1 if unit == 'day' else 8
+        return [(*key, workload * factor) for key, workload in self.__person_workloads.items()
+                if person_key is None or key[0] == person_key]
+
+    # 单个人员在参考表上的工时矩阵，仅在需要时构建
+    def person_matrix(self, person_key: str, ref_map: ReferenceMap, unit='day'):
         array = np.zeros(ref_map.value_shape)
-        for cell in self.__cells:
-            if not cell.refer_from(ref_map):
-                continue
-            row_index, col_index = cell.coord_index
-            array[row_index][col_index] = cell_property(cell)
+        for _, sheet_name, row_index, col_index, workload in self.person_workload_entries(person_key, unit):
+            if sheet_name == ref_map.worksheet_name:
+                array[row_index, col_index] += workload
         return array
 
-    def __synthesize_sheet(self, ref_map: ReferenceMap, cell_property: Callable[[Cell], int | float], head='{}'):
-        value_array = self.__build_matrix(ref_map, cell_property)
-        worksheet = ref_map.value_array2synthesize_sheet(value_array)
+    # 人员汇总：按总工时降序，每人列出工时最多的 top_n 个参考表位置
+    def person_summary(self, top_n: int = 5, unit='day'):
+        ref_maps = {ref_map.worksheet_name: ref_map for ref_map in (self.__ref_test, self.__ref_manage)}
+        grouped: dict[str, list[tuple[str, int, int, float]]] = {}
+        for person_key, sheet_name, row_index, col_index, workload in self.person_workload_entries(unit=unit):
+            grouped.setdefault(person_key, []).append((sheet_name, row_index, col_index, workload))
+        summary_list = []
+        for person_key, entries in grouped.items():
+            # 工时相同时按位置排序，结果与工时的计入顺序无关
+            entries.sort(key=lambda x: (-x[3], x[:3]))
+            top_list = []
+            for sheet_name, row_index, col_index, workload in entries[:top_n]:
+                row_labels, col_labels = ref_maps[sheet_name].coord_labels(row_index, col_index)
+                top_list.append('[%s]%s: %.2f' % (sheet_name, '-'.join(map(str, (*row_labels, *col_labels))),
+                                                  workload))
+            summary_list.append([self.__persons[person_key].displayName, person_key,
+                                 sum(x[3] for x in entries), len(entries), '\n'.join(top_list)])
+        summary = pd.DataFrame(summary_list, columns=['person', 'key', 'workload(person·%s)' % unit,
+                                                      'positions', 'top %d positions' % top_n])
+        summary.sort_values(by=[summary.columns[2], 'key'], ascending=[False, True], inplace=True)
+        summary.reset_index(drop=True, inplace=True)
+        return summary
+
+    # 人员工作簿：首个工作表为人员汇总，之后为工时最多的 top_persons 人（或指定人员）在各参考表上的工时矩阵
+    def export_person_workbook(self, top_persons: int = 10, person_keys: list[str] = None, top_n: int = 5,
+                               color_scale=False):
+        unit = 'day'
+        print("Exporting person workbook ...")
+        summary = self.person_summary(top_n, unit)
+        workbook = load_workbook(self.__ref_filename)
+        template_sheets = list(workbook.worksheets)
+        summary_ws = workbook.create_sheet('Persons')
+        summary_ws.append(list(summary.columns))
+        for row_content in summary.itertuples(index=False):
+            summary_ws.append(list(row_content))
+        # 最后一列为多行的位置列表，左对齐并自动换行
+        self.__format_table_sheet(summary_ws, [len(summary.columns)])
+        if person_keys is None:
+            person_keys = list(summary['key'][:top_persons])
+        persons_in_sheet = {(key, sheet_name) for key, sheet_name, *_ in self.__person_workloads.keys()}
+        for person_key in person_keys:
+            person = self.__persons[person_key]
+            for ref_map, template_ws, suffix in [(self.__ref_test, template_sheets[0], 'Test'),
+                                                 (self.__ref_manage, template_sheets[1], 'Manage')]:
+                if (person_key, ref_map.worksheet_name) not in persons_in_sheet:
+                    continue
+                title = re.sub(r'[\\/*?:\[\]]', '_', '%s(%s)' % (person.displayName, suffix))[:31]
+                self.__synthesize_sheet(workbook, template_ws, title, ref_map,
+                                        self.person_matrix(person_key, ref_map, unit),
+                                        "%s workload of {}(person·%s)" % (person.displayName, unit), color_scale)
+        for template_ws in template_sheets:
+            workbook.remove(template_ws)
+        workbook.active = 0
+        print("Exporting person workbook completed\n")
+        return workbook
+
+    # 趋势表：每个有工时的参考表位置一行（纵轴坐标、横轴坐标、各时间区间的工时、合计），最后一行为各区间合计
+    def __trend_sheet(self, workbook: Workbook, title: str, ref_map: ReferenceMap, bucket: str, unit: str):
+        buckets, cube = self.build_time_cube(ref_map, bucket, unit)
+        worksheet = workbook.create_sheet(title)
+        label_format = '%Y-%m' if bucket == 'month' else '%Y-%m-%d'
+        row_labels, col_labels = ref_map.coord_labels(0, 0)
+        worksheet.append(['row-%d' % (i + 1) for i in range(len(row_labels))]
+                         + ['col-%d' % (j + 1) for j in range(len(col_labels))]
+                         + [bucket_start.strftime(label_format) if bucket_start is not None else 'Undated'
+                            for bucket_start in buckets] + ['Total'])
+        totals = cube.sum(axis=0)
+        for i, j in zip(*np.nonzero(totals)):
+            row_labels, col_labels = ref_map.coord_labels(i, j)
+            worksheet.append([*row_labels, *col_labels, *cube[:, i, j].tolist(), float(totals[i, j])])
+        worksheet.append(['Total'] + [None] * (len(row_labels) + len(col_labels) - 1)
+                         + cube.sum(axis=(1, 2)).tolist() + [float(totals.sum())])
+        worksheet.freeze_panes = worksheet.cell(2, len(row_labels) + len(col_labels) + 1)
+        self.__format_table_sheet(worksheet)
+        return worksheet
+
+    # 表格类工作表（人员汇总、趋势表）的格式：整表边框及居中，wrap_cols 列左对齐并自动换行，表头加粗
+    # 整列规则与表头规则各一次遍历（WorksheetShell.batch_set_rules），整列规则同时写入列默认样式
+    @staticmethod
+    def __format_table_sheet(worksheet: Worksheet, wrap_cols: list[int | str] = None):
+        shell = WorksheetShell(worksheet)
+        rules = [
+            (CellSetting.setting_cell_border, None, None),
+            (CellSetting.setting_text_alignment, None, {'horizontal': 'center', 'vertical': 'center'}),
+        ]
+        if wrap_cols:
+            rules += [
+                (CellSetting.setting_text_alignment, wrap_cols, {'horizontal': 'left', 'vertical': 'center'}),
+                (CellSetting.setting_word_wrap, wrap_cols, None),
+            ]
+        shell.batch_set_rules(rules)
+        shell.batch_set_rules([(CellSetting.setting_basic_font, None, {'bold': True})],
+                              scope=RCActivator.scope_int2str(1, 1, 1, shell.max_col))
+
+    @staticmethod
+    def __synthesize_sheet(workbook: Workbook, template_ws: Worksheet, title: str, ref_map: ReferenceMap,
+                           value_array: np.ndarray, head='{}', color_scale=False):
+        # 在目标工作簿内直接克隆参考表模板
+        worksheet = workbook.copy_worksheet(template_ws)
+        worksheet.title = title
+        ref_map.value_array2synthesize_sheet(value_array, color_scale=color_scale, worksheet=worksheet)
         worksheet.cell(1, 1).value = head.format(ref_map.worksheet_name)
         return worksheet
 
-    def __downmix_sheet(self, ref_map: ReferenceMap, downmix_x: int | None, downmix_y: int | None,
-                        cell_property: Callable[[Cell], int | float], head='{}'):
-        value_array = self.__build_matrix(ref_map, cell_property)
-        worksheet = ref_map.value_array2downmix_sheet(value_array, downmix_x, downmix_y)
+    @staticmethod
+    def __downmix_sheet(workbook: Workbook, template_ws: Worksheet, title: str, ref_map: ReferenceMap,
+                        downmix_x: int | None, downmix_y: int | None, value_array: np.ndarray,
+                        head='{}', color_scale=False):
+        worksheet = ref_map.value_array2downmix_sheet(value_array, downmix_x, downmix_y, color_scale=color_scale,
+                                                      worksheet=workbook.create_sheet(title), template_ws=template_ws)
         worksheet.cell(1, 1).value = (head.format(ref_map.worksheet_name)
                                       + ' downmix by (%s, %s)' % (downmix_x, downmix_y))
         return worksheet
 
-    def export_matrix_workbook(self):
+    # color_scale: 热力图使用 Excel 原生条件格式着色
+    # downmix_levels: 各压缩表的 (level_x, level_y)，均由同一个基础矩阵压缩得到
+    # trend_bucket: month/week/day，不为空时为每个参考表追加按该时间区间统计的工时趋势表
+    def export_matrix_workbook(self, color_scale=False, downmix_levels: list[tuple[int | None, int | None]] = None,
+                               trend_bucket: str = None):
         unit = 'day'
-
-        def cell_count(cell: Cell):
-            return cell.num_issues
-
-        def cell_workload(cell: Cell):
-            return cell.cumulative_workload(unit=unit)
-
+        if downmix_levels is None:
+            downmix_levels = [(None, 1)]
         count_head = r"Count of {}"
         workload_head = r"Cumulative workload of {}(person·%s)" % unit
         print("Exporting matrix workbook ...")
-        workbook = Workbook()
-        worksheet = workbook.active
-        # 测试计数
-        print("Building count matrix and synthesizing with ref_test style ...")
-        test_count = self.__synthesize_sheet(self.__ref_test, cell_count, count_head)
-        WorksheetProcessor.copy_into(test_count, worksheet)
-        worksheet.title = 'Count of Test'
-        # 测试计数压缩
-        print("Building DOWNMIX count matrix base on ref_test ...")
-        test_count_dm = self.__downmix_sheet(self.__ref_test, None, 1, cell_count, count_head)
-        WorksheetProcessor.copy_into(test_count_dm, workbook.create_sheet('Count of Test(DOWNMIX)'))
-        # 测试计时
-        print("Building workload matrix and synthesizing with ref_test style ...")
-        test_workload = self.__synthesize_sheet(self.__ref_test, cell_workload, workload_head)
-        WorksheetProcessor.copy_into(test_workload, workbook.create_sheet('Time of Test'))
-        # 测试计时压缩
-        print("Building DOWNMIX workload matrix base on ref_test ...")
-        test_workload_dm = self.__downmix_sheet(self.__ref_test, None, 1, cell_workload, workload_head)
-        WorksheetProcessor.copy_into(test_workload_dm, workbook.create_sheet('Time of Test(DOWNMIX)'))
-        # 管理计数
-        print("Building count matrix and synthesizing with ref_manage style ...")
-        manage_count = self.__synthesize_sheet(self.__ref_manage, cell_count, count_head)
-        WorksheetProcessor.copy_into(manage_count, workbook.create_sheet('Count of Manage'))
-        # 管理计数压缩
-        pass
-        # 管理计时
-        print("Building workload matrix and synthesizing with ref_manage style ...")
-        manage_workload = self.__synthesize_sheet(self.__ref_manage, cell_workload, workload_head)
-        WorksheetProcessor.copy_into(manage_workload, workbook.create_sheet('Time of Manage'))
+        # 参考表工作簿作为输出工作簿载入一次，各输出表在其内部克隆模板，最后移除模板表
+        workbook = load_workbook(self.__ref_filename)
+        template_sheets = list(workbook.worksheets)
+        outputs = [
+            # (参考表, 模板表, 名称, 指标, 表头)
+            (self.__ref_test, template_sheets[0], 'Count of Test', 'issues', count_head),
+            (self.__ref_test, template_sheets[0], 'Time of Test', 'cumulative', workload_head),
+            (self.__ref_manage, template_sheets[1], 'Count of Manage', 'issues', count_head),
+            (self.__ref_manage, template_sheets[1], 'Time of Manage', 'cumulative', workload_head),
+        ]
+        for ref_map, template_ws, title, metric, head in outputs:
+            print("Building matrix '%s' and synthesizing with %s style ..." % (title, ref_map.worksheet_name))
+            # 基础矩阵取自指标堆叠，完整表及各层压缩表共用
+            value_array = self.metric_array(ref_map, metric, unit)
+            self.__synthesize_sheet(workbook, template_ws, title, ref_map, value_array, head, color_scale)
+            for i, (downmix_x, downmix_y) in enumerate(downmix_levels):
+                print("Building DOWNMIX matrix '%s' by (%s, %s) ..." % (title, downmix_x, downmix_y))
+                suffix = '(DOWNMIX)' if len(downmix_levels) == 1 else '(DOWNMIX-%d)' % (i + 1)
+                self.__downmix_sheet(workbook, template_ws, title + suffix, ref_map, downmix_x, downmix_y,
+                                     value_array, head, color_scale)
+        if trend_bucket is not None:
+            for ref_map, title in [(self.__ref_test, 'Trend of Test'), (self.__ref_manage, 'Trend of Manage')]:
+                print("Building %s trend of %s ..." % (trend_bucket, ref_map.worksheet_name))
+                self.__trend_sheet(workbook, '%s(%s)' % (title, trend_bucket), ref_map, trend_bucket, unit)
+        for template_ws in template_sheets:
+            workbook.remove(template_ws)
+        workbook.active = 0
         print("Exporting matrix workbook completed\n")
-        # 管理计时压缩
-        pass
         return workbook
 
     def workload_analyzer(self):
@@ -1,42 +1,73 @@
-from models import JIRALogin, IssueList, ConcatFilter, JIRAOperator, Matrix, WorksheetShell
+from models import JIRALogin, IssueList, ConcatFilter, JIRAOperator, Matrix, StreamingSheetWriter
+from models.workloadAnalyse import WORKLOG_COLUMNS
+from models.JQL import worklog_window
+from datetime import date
 from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 
 
-def export_worklog_workbook(wm: Matrix):
-    df = wm.export_worklog_table()
-    workbook = Workbook()
-    worksheet = workbook.active
-    for row_content in dataframe_to_rows(df, index=False, header=True):
-        worksheet.append(row_content)
-    WorksheetShell(worksheet).batch_set_column_width({
+def export_worklog_workbook(wm: Matrix, streaming=False):
+    # 流式写出，列宽需在写入数据前设置
+    workbook = Workbook(write_only=True)
+    writer = StreamingSheetWriter(workbook.create_sheet())
+    writer.batch_set_column_width({
         'A': 60,
         'B': 40,
         'C': 40,
         'D': 40,
     })
+    if streaming:
+        # 流式模式下从工时明细文件读取，排序后逐行写出，不构建 DataFrame；排序与非流式模式一致
+        writer.append(WORKLOG_COLUMNS)
+        for row_content in wm.iter_worklog_rows(sort=True):
+            writer.append(row_content)
+    else:
+        df = wm.export_worklog_table()
+        for row_content in dataframe_to_rows(df, index=False, header=True):
+            writer.append(row_content)
+    writer.close()
     filename = 'Export Worklog.xlsx'
     workbook.save(filename)
     print('Worklog table save as %s.' % filename)
 
 
 def export_matrix_workbook(wm: Matrix):
-    workbook = wm.export_matrix_workbook()
+    workbook = wm.export_matrix_workbook(trend_bucket='month')
     filename = 'MatrixAggregation.xlsx'
     workbook.save(filename)
     print('Matrix Aggregation save as: %s' % filename)
 
 
+def export_person_workbook(wm: Matrix):
+    workbook = wm.export_person_workbook(top_persons=10)
+    filename = 'PersonAggregation.xlsx'
+    workbook.save(filename)
+    print('Person Aggregation save as: %s' % filename)
+
+
 if __name__ == '__main__':
     jira_agent = JIRALogin.used_token(r'access_token.txt')
     issue_list = IssueList(jira_agent.get_fields())
     # issue_list.import_issues(jira_agent.search_by_jql_filter(BaseFilter.ALL_TASK_LIKE))
     # issue_list.import_issues(jira_agent.search_by_jql_filter(BaseFilter.ALL_TASK_LIKE_GOOGLE))
-    issue_list.import_issues(jira_agent.search_by_jql_filter(ConcatFilter.ALL_TASK_LIKE))
+    # 报表时间窗口，为空时统计全部工作日志
+    window_start, window_end = None, None
+    # window_start, window_end = date(2025, 1, 1), date(2025, 1, 31)
+    # 流式模式：逐页加载事务，只保留汇总结果，适用于全年等大数据量报表
+    streaming = False
+    pages = jira_agent.search_pages_by_jql_filter(worklog_window(ConcatFilter.ALL_TASK_LIKE, window_start, window_end))
     jira_op = JIRAOperator(jira_agent)
-    workload_matrix = Matrix(issue_list, jira_op, '2025年标准工时时间表.xlsx')
+    if streaming:
+        workload_matrix = Matrix.streaming(issue_list.iter_issue_pages(pages), jira_op, '2025年标准工时时间表.xlsx',
+                                           worklog_sink='WorklogDetail.csv', max_workers=8,
+                                           window_start=window_start, window_end=window_end)
+    else:
+        issue_list.import_issue_pages(pages)
+        workload_matrix = Matrix(issue_list, jira_op, '2025年标准工时时间表.xlsx', max_workers=8,
+                                 window_start=window_start, window_end=window_end)
     load_report = workload_matrix.meta_data_loading_report()
     load_report.to_excel('LoadingReport.xlsx', header=True, index=False)
-    export_worklog_workbook(workload_matrix)
+    export_worklog_workbook(workload_matrix, streaming)
     print(jira_op.call_num_log, '\n')
     export_matrix_workbook(workload_matrix)
+    export_person_workbook(workload_matrix)